@@ -1,19 +1,44 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, Response
 import os
-import shutil
+import re
+import glob
 import uuid
-import whisper
+import hashlib
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from faster_whisper import WhisperModel, BatchedInferencePipeline, decode_audio
+import ctranslate2
+import numpy as np
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import time
 from app.services.statute_extractor import StatuteExtractor
 from app.services.statute_lookup import StatuteLookupService
-from app.services.report_generator import ReportGenerator
+from app.services.report_generator import ReportGenerator, start_report_workers, shutdown_report_workers
+from app.services.transcription_cache import TranscriptionCache
 
-app = FastAPI(title="CourtCaseVibe API", description="API for court case audio transcription and statute verification")
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load Whisper before the server accepts traffic so no request pays for it
+    app.state.whisper_model = load_whisper_model()
+    warm_up_whisper_model(app.state.whisper_model)
+    start_report_workers()
+    yield
+    shutdown_report_workers()
+    del app.state.whisper_model
+
+app = FastAPI(
+    title="CourtCaseVibe API",
+    description="API for court case audio transcription and statute verification",
+    lifespan=lifespan
+)
 
 # Configure CORS
 app.add_middleware(
@@ -28,18 +53,176 @@ app.add_middleware(
 UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Accepted audio file extensions (compared lowercased)
+ALLOWED_AUDIO_EXTENSIONS = frozenset((".mp3", ".wav", ".m4a", ".ogg"))
+
+# Uploads are streamed to disk in fixed-size chunks to keep memory flat
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+def store_upload(source, temp_path: str) -> str:
+    """
+    Copy an uploaded file to disk in chunks and hash it along the way
+    
+    The whole copy runs in one worker thread, so a large upload costs a
+    single hop off the event loop rather than two per chunk.
+    
+    Args:
+        source: Binary file object holding the upload
+        temp_path: Path to write the copy to
+        
+    Returns:
+        Hex SHA-256 digest of the file contents
+    """
+    hasher = hashlib.sha256()
+    try:
+        with open(temp_path, "wb", buffering=0) as buffer:
+            while chunk := source.read(UPLOAD_CHUNK_SIZE):
+                hasher.update(chunk)
+                buffer.write(chunk)
+    except BaseException:
+        # Don't leave a partial copy behind if the client disconnects or the disk fills
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return hasher.hexdigest()
+
+# Maps each file_id to its stored filename so lookups don't scan UPLOAD_DIR
+file_index: Dict[str, str] = {}
+
+# File IDs are the first 16 hex digits of the upload's SHA-256
+FILE_ID_RE = re.compile(r"[0-9a-f]{16}")
+
+def resolve_upload_path(file_id: str) -> Optional[str]:
+    """Return the stored path for an uploaded file ID, or None if it doesn't exist"""
+    # Anything else could reach outside UPLOAD_DIR, so it is never looked up
+    if not FILE_ID_RE.fullmatch(file_id):
+        return None
+    filename = file_index.get(file_id)
+    if filename is None:
+        # Files uploaded before a restart aren't indexed yet
+        matches = glob.glob(os.path.join(UPLOAD_DIR, f"{glob.escape(file_id)}.*"))
+        if not matches:
+            return None
+        filename = os.path.basename(matches[0])
+        file_index[file_id] = filename
+    return os.path.join(UPLOAD_DIR, filename)
+
+# Uploads are decoded once to 16kHz mono float32, the input format Whisper
+# expects, so transcription doesn't re-decode and resample the file each time
+WHISPER_SAMPLE_RATE = 16000
+
+def decoded_audio_path(file_id: str) -> str:
+    """Return the path of the decoded waveform for an uploaded file ID"""
+    if not FILE_ID_RE.fullmatch(file_id):
+        raise ValueError(f"Invalid file ID: {file_id!r}")
+    return os.path.join(UPLOAD_DIR, "decoded", f"{file_id}.npy")
+
+def decode_upload(file_id: str, file_path: str) -> None:
+    """Decode an uploaded audio file and store the waveform as .npy"""
+    target_path = decoded_audio_path(file_id)
+    if os.path.exists(target_path):
+        return
+    
+    try:
+        audio = decode_audio(file_path, sampling_rate=WHISPER_SAMPLE_RATE)
+    except Exception:
+        # Transcription falls back to the original file and reports the error there
+        logger.exception("Could not decode upload %s", file_id)
+        return
+    
+    # Write to a temporary file first so readers never see a partial array
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    temp_path = f"{target_path}.{uuid.uuid4()}.part"
+    try:
+        with open(temp_path, "wb") as f:
+            np.save(f, audio.astype(np.float32, copy=False))
+        os.replace(temp_path, target_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def load_upload_audio(file_id: str, file_path: str):
+    """Return the decoded waveform for an upload, or its path if it wasn't decoded"""
+    decoded_path = decoded_audio_path(file_id)
+    if os.path.exists(decoded_path):
+        # Memory-mapped so concurrent workers share the page cache
+        return np.load(decoded_path, mmap_mode="r")
+    return file_path
+
 # Load Whisper model (small to balance speed and accuracy)
 # Note: The first time this runs, it will download the model
-model = None
+# faster-whisper runs the model on CTranslate2 with int8 weights, which is
+# several times faster than the reference PyTorch implementation on CPU.
+# With WHISPER_VAD_FILTER set, the batched pipeline splits each recording into
+# speech chunks and decodes up to WHISPER_BATCH_SIZE of them in a single forward pass.
+WHISPER_MODEL_NAME = "small"  # Options: tiny, base, small, medium, large-v3
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "16"))
+WHISPER_DEVICE = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+# int8 weights by default; set e.g. "float32" or "float16" if accuracy on
+# real hearing audio regresses
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE") or (
+    "int8_float16" if WHISPER_DEVICE == "cuda" else "int8"
+)
+# FlashAttention 2 needs an Ampere or newer GPU, so it is opt-in
+WHISPER_FLASH_ATTENTION = os.getenv("WHISPER_FLASH_ATTENTION", "0") == "1"
+# Voice activity detection skips the long silences in courtroom audio, but it
+# can also drop quiet speech, so it is opt-in. Without it the whole recording is
+# decoded sequentially, as the reference Whisper implementation does.
+WHISPER_VAD_FILTER = os.getenv("WHISPER_VAD_FILTER", "0") == "1"
+
+def load_whisper_model():
+    """Load the Whisper model, on the GPU when one is available"""
+    model_kwargs = {}
+    if WHISPER_DEVICE == "cuda" and WHISPER_FLASH_ATTENTION:
+        model_kwargs["flash_attention"] = True
+    model = WhisperModel(
+        WHISPER_MODEL_NAME,
+        device=WHISPER_DEVICE,
+        compute_type=WHISPER_COMPUTE_TYPE,
+        # One model worker per transcription thread so files are decoded in
+        # parallel, with the cores split between them
+        cpu_threads=max(1, (os.cpu_count() or 1) // WHISPER_WORKERS),
+        num_workers=WHISPER_WORKERS,
+        **model_kwargs
+    )
+    # The batched pipeline needs VAD to split recordings longer than 30 seconds
+    return BatchedInferencePipeline(model=model) if WHISPER_VAD_FILTER else model
+
+def warm_up_whisper_model(model) -> None:
+    """Run a short silent clip through the model so the first request doesn't pay for device setup"""
+    silence = np.zeros(WHISPER_SAMPLE_RATE * 10, dtype=np.float32)
+    segments, _ = model.transcribe(silence, beam_size=1, vad_filter=False)
+    for _ in segments:
+        pass
+
+# Whisper inference blocks for the whole length of the audio, so it runs on a
+# small dedicated thread pool instead of stalling the event loop
+WHISPER_WORKERS = int(os.getenv("WHISPER_WORKERS", "2"))
+whisper_executor = ThreadPoolExecutor(max_workers=WHISPER_WORKERS)
+
+# Greedy decoding, batched over the speech chunks when VAD is enabled
+WHISPER_TRANSCRIBE_OPTIONS = {"beam_size": 1}
+if WHISPER_VAD_FILTER:
+    WHISPER_TRANSCRIBE_OPTIONS.update(vad_filter=True, batch_size=WHISPER_BATCH_SIZE)
 
-def get_whisper_model():
-    global model
-    if model is None:
-        model = whisper.load_model("small")  # Options: tiny, base, small, medium, large
-    return model
+# Cached transcriptions are keyed on the model and every setting that changes
+# its output, so changing any of them doesn't serve stale results
+TRANSCRIPTION_CACHE_KEY = "/".join(
+    [WHISPER_MODEL_NAME, WHISPER_COMPUTE_TYPE]
+    + [f"{name}={value}" for name, value in sorted(WHISPER_TRANSCRIBE_OPTIONS.items())]
+)
+
+def transcribe_file(model, audio) -> str:
+    """Transcribe a single audio file or decoded waveform and return the full text"""
+    segments, _ = model.transcribe(audio, **WHISPER_TRANSCRIBE_OPTIONS)
+    # Segments are decoded lazily, so consume them here on the worker thread
+    return "".join(segment.text for segment in segments)
 
-# Initialize the statute extractor
-statute_extractor = StatuteExtractor()
+# Initialize the statute extractor; the regex patterns cover the citation
+# formats we see, so the SpaCy NER pass is opt-in
+STATUTE_USE_NER = os.getenv("STATUTE_USE_NER", "0") == "1"
+statute_extractor = StatuteExtractor(use_ner=STATUTE_USE_NER)
 
 # Initialize the statute lookup service
 statute_lookup = StatuteLookupService()
@@ -47,9 +230,13 @@ statute_lookup = StatuteLookupService()
 # Initialize the report generator
 report_generator = ReportGenerator()
 
+# Initialize the transcription cache
+transcription_cache = TranscriptionCache()
+
 class TranscriptionRequest(BaseModel):
     hearing_date: str
     file_ids: List[str]
+    force_refresh: bool = False
 
 class StatuteReference(BaseModel):
     statute_id: str
@@ -86,27 +273,104 @@ class ReportResponse(BaseModel):
     download_link: str
     format: str
 
+async def process_audio_file(model, file_id: str, file_path: str, hearing_date: str) -> TranscriptionResponse:
+    """
+    Transcribe one audio file and verify the statutes it mentions
+    
+    Args:
+        model: The loaded Whisper model
+        file_id: The uploaded file identifier
+        file_path: Path to the stored audio file
+        hearing_date: Hearing date to attach to the result
+        
+    Returns:
+        TranscriptionResponse with statute references and comparisons
+    """
+    loop = asyncio.get_running_loop()
+    audio = load_upload_audio(file_id, file_path)
+    transcription = await loop.run_in_executor(whisper_executor, transcribe_file, model, audio)
+    
+    # Extract statute references using our StatuteExtractor
+    statutes, highlighted_text = statute_extractor.get_highlighted_json(transcription)
+    
+    # Convert statutes to StatuteReference model objects
+    statute_references = [
+        StatuteReference(
+            statute_id=statute["statute_id"],
+            start_idx=statute["start_idx"],
+            end_idx=statute["end_idx"],
+            text=statute["text"],
+            match_type=statute["match_type"]
+        ) for statute in statutes
+    ]
+    
+    # Lookup and compare statutes with the Florida Statutes website
+    statute_comparisons = []
+    if statutes:
+        # Prepare statute data for batch processing
+        statute_data = [
+            {"statute_id": statute["statute_id"], "text": statute["text"]} 
+            for statute in statutes
+        ]
+        
+        # Process statutes in batch; the lookups are network-bound, so they
+        # overlap with Whisper still running on the other files
+        comparison_results = await asyncio.to_thread(statute_lookup.batch_process_statutes, statute_data)
+        
+        # Convert to Pydantic models
+        statute_comparisons = [
+            StatuteComparison(
+                statute_id=comp["statute_id"],
+                transcript_text=comp["transcript_text"],
+                statute_text=comp["statute_text"],
+                similarity_score=comp["similarity_score"],
+                is_discrepancy=comp["is_discrepancy"],
+                url=comp["url"],
+                title=comp.get("title"),
+                error=comp.get("error")
+            ) for comp in comparison_results
+        ]
+    
+    return TranscriptionResponse(
+        transcription=transcription,
+        highlighted_transcription=highlighted_text,
+        file_id=file_id,
+        hearing_date=hearing_date,
+        statutes=statute_references,
+        statute_comparisons=statute_comparisons
+    )
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to CourtCaseVibe API"}
 
 @app.post("/upload/", status_code=201)
 async def upload_audio(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     hearing_date: str = Form(...)
 ):
-    if not file.filename.endswith(('.mp3', '.wav', '.m4a', '.ogg')):
+    file_extension = os.path.splitext(file.filename)[1].lower()
+    if file_extension not in ALLOWED_AUDIO_EXTENSIONS:
         raise HTTPException(status_code=400, detail="Only audio files are allowed")
     
-    # Create a unique filename to prevent collisions
-    file_id = str(uuid.uuid4())
-    file_extension = os.path.splitext(file.filename)[1]
-    new_filename = f"{file_id}{file_extension}"
+    # Stream to a temporary file first; the final name depends on the content
+    temp_path = os.path.join(UPLOAD_DIR, f".upload-{uuid.uuid4()}.part")
+    digest = await asyncio.to_thread(store_upload, file.file, temp_path)
     
-    # Save the file
+    # Identical audio maps to the same file_id, so re-uploads are stored once
+    file_id = digest[:16]
+    new_filename = f"{file_id}{file_extension}"
     file_path = os.path.join(UPLOAD_DIR, new_filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    if os.path.exists(file_path):
+        os.remove(temp_path)
+    else:
+        os.replace(temp_path, file_path)
+    file_index[file_id] = new_filename
+    
+    # Decode after responding so transcription can start from the waveform;
+    # until it finishes, transcription reads the original file
+    background_tasks.add_task(decode_upload, file_id, file_path)
     
     return {
         "file_id": file_id,
@@ -115,75 +379,44 @@ async def upload_audio(
         "stored_path": file_path
     }
 
-@app.post("/transcribe/")
-async def transcribe_audio(request: TranscriptionRequest):
-    model = get_whisper_model()
-    results = []
+@app.post("/transcribe/", response_model=List[TranscriptionResponse])
+async def transcribe_audio(request: TranscriptionRequest, http_request: Request):
+    results = [None] * len(request.file_ids)
+    pending = []
     
-    for file_id in request.file_ids:
-        # Find the file with the matching ID prefix
-        matching_files = [f for f in os.listdir(UPLOAD_DIR) if f.startswith(file_id)]
+    for i, file_id in enumerate(request.file_ids):
+        file_path = resolve_upload_path(file_id)
         
-        if not matching_files:
+        if file_path is None:
             raise HTTPException(status_code=404, detail=f"File ID {file_id} not found")
-            
-        file_path = os.path.join(UPLOAD_DIR, matching_files[0])
         
-        # Transcribe with Whisper
-        try:
-            result = model.transcribe(file_path)
-            transcription = result["text"]
-            
-            # Extract statute references using our StatuteExtractor
-            statutes, highlighted_text = statute_extractor.get_highlighted_json(transcription)
-            
-            # Convert statutes to StatuteReference model objects
-            statute_references = [
-                StatuteReference(
-                    statute_id=statute["statute_id"],
-                    start_idx=statute["start_idx"],
-                    end_idx=statute["end_idx"],
-                    text=statute["text"],
-                    match_type=statute["match_type"]
-                ) for statute in statutes
-            ]
+        # Reuse the stored result for files that were already transcribed
+        if not request.force_refresh:
+            cached_result = transcription_cache.get(file_id, TRANSCRIPTION_CACHE_KEY)
+            if cached_result:
+                cached_result["hearing_date"] = request.hearing_date
+                results[i] = TranscriptionResponse(**cached_result)
+                continue
             
-            # Lookup and compare statutes with the Florida Statutes website
-            statute_comparisons = []
-            if statutes:
-                # Prepare statute data for batch processing
-                statute_data = [
-                    {"statute_id": statute["statute_id"], "text": statute["text"]} 
-                    for statute in statutes
-                ]
-                
-                # Process statutes in batch
-                comparison_results = statute_lookup.batch_process_statutes(statute_data)
-                
-                # Convert to Pydantic models
-                statute_comparisons = [
-                    StatuteComparison(
-                        statute_id=comp["statute_id"],
-                        transcript_text=comp["transcript_text"],
-                        statute_text=comp["statute_text"],
-                        similarity_score=comp["similarity_score"],
-                        is_discrepancy=comp["is_discrepancy"],
-                        url=comp["url"],
-                        title=comp.get("title"),
-                        error=comp.get("error")
-                    ) for comp in comparison_results
-                ]
-            
-            results.append(TranscriptionResponse(
-                transcription=transcription,
-                highlighted_transcription=highlighted_text,
-                file_id=file_id,
-                hearing_date=request.hearing_date,
-                statutes=statute_references,
-                statute_comparisons=statute_comparisons
-            ))
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Transcription error: {str(e)}")
+        pending.append((i, file_id, file_path))
+    
+    if not pending:
+        return results
+    
+    # Process all remaining files concurrently; each file's statute lookups
+    # start as soon as its own transcription finishes
+    model = http_request.app.state.whisper_model
+    try:
+        responses = await asyncio.gather(*(
+            process_audio_file(model, file_id, file_path, request.hearing_date)
+            for _, file_id, file_path in pending
+        ))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Transcription error: {str(e)}")
+    
+    for (i, file_id, _), response in zip(pending, responses):
+        results[i] = response
+        transcription_cache.set(file_id, TRANSCRIPTION_CACHE_KEY, response.model_dump())
     
     return results
 
@@ -205,7 +438,7 @@ async def get_statute(statute_id: str, force_refresh: bool = False):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving statute: {str(e)}")
 
-@app.post("/generate-report")
+@app.post("/generate-report", response_model=ReportResponse)
 async def generate_report(request: ReportRequest):
     """
     Generate a report of transcriptions and statute analyses
@@ -217,14 +450,15 @@ async def generate_report(request: ReportRequest):
         Path to the generated report file and a download link
     """
     try:
+        # Report rendering is CPU-bound, so it runs in a worker process
         if request.format.lower() == 'json':
-            report_path = report_generator.generate_json_report(
+            report_path = await report_generator.generate_json_report_async(
                 request.transcriptions, 
                 request.metadata
             )
             content_type = "application/json"
         elif request.format.lower() == 'pdf':
-            report_path = report_generator.generate_pdf_report(
+            report_path = await report_generator.generate_pdf_report_async(
                 request.transcriptions,
                 request.metadata
             )
@@ -246,6 +480,41 @@ async def generate_report(request: ReportRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating report: {str(e)}")
 
+@app.post("/export-report")
+async def export_report(request: ReportRequest):
+    """
+    Generate a report and return it directly, without storing it on disk
+    
+    Args:
+        request: ReportRequest containing format and transcription data
+        
+    Returns:
+        The report file as a download
+    """
+    report_format = request.format.lower()
+    if report_format == 'json':
+        media_type = "application/json"
+    elif report_format == 'pdf':
+        media_type = "application/pdf"
+    else:
+        raise HTTPException(status_code=400, detail="Unsupported report format. Use 'json' or 'pdf'.")
+    
+    # Render into memory in a worker process, like /generate-report
+    try:
+        filename, content = await report_generator.export_report_async(
+            report_format,
+            request.transcriptions,
+            request.metadata
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating report: {str(e)}")
+    
+    return Response(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @app.get("/download-report/{filename}")
 async def download_report(filename: str):
     """
@@ -257,12 +526,16 @@ async def download_report(filename: str):
     Returns:
         The report file as a download
     """
-    reports_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "reports")
-    file_path = os.path.join(reports_dir, filename)
+    reports_dir = os.path.realpath(os.path.join(os.path.dirname(os.path.dirname(__file__)), "reports"))
+    file_path = os.path.realpath(os.path.join(reports_dir, filename))
     
-    if not os.path.exists(file_path):
+    # Only serve and touch files that resolve to inside the reports directory
+    if os.path.dirname(file_path) != reports_dir or not os.path.isfile(file_path):
         raise HTTPException(status_code=404, detail="Report file not found")
     
+    # Mark the report as recently used so it is evicted last
+    os.utime(file_path)
+    
     # Determine content type based on file extension
     if filename.endswith('.json'):
         media_type = "application/json"
@@ -279,4 +552,13 @@ async def download_report(filename: str):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # uvloop and httptools come with uvicorn[standard]; each worker process
+    # loads its own copy of the Whisper model
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1"))
+    )
@@ -2,24 +2,217 @@
 Report generation service for CourtCaseVibe
 Provides functionality to create PDF and JSON reports from transcription data
 """
-import json
+import io
 import os
 import datetime
 import sys
-from typing import Dict, List, Any
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, BinaryIO, Optional, Tuple
 from pathlib import Path
+from xml.sax.saxutils import escape
+from pydantic import BaseModel
+
+# orjson is much faster for large reports; fall back to the stdlib if it's missing
+HAS_ORJSON = True
+try:
+    import orjson
+except ImportError:
+    import json
+    HAS_ORJSON = False
+
+# Generated reports kept on disk before the least recently used are deleted
+MAX_REPORT_COUNT = int(os.getenv("MAX_REPORT_COUNT", "500"))
+MAX_REPORT_BYTES = int(os.getenv("MAX_REPORT_BYTES", str(1024 ** 3)))
+REPORT_FILENAME_PREFIX = "courtcasevibe_report_"
+
+# Worker processes for rendering reports; ReportLab is pure Python, so separate
+# processes let concurrent reports use more than one core. The pool is started
+# and shut down with the app.
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+
+# Longest official statute text quoted in a PDF report before it is cut off
+PDF_STATUTE_TEXT_LIMIT = 500
 
 # For PDF generation - moved inside functions to avoid module-level import errors
 HAS_REPORTLAB = True
 try:
     from reportlab.lib.pagesizes import letter
     from reportlab.lib import colors
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
     from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
     from reportlab.lib.units import inch
+    from reportlab import rl_config
 except ImportError:
     HAS_REPORTLAB = False
 
+if HAS_REPORTLAB:
+    # Skip ReportLab's per-attribute validation of shapes while drawing
+    rl_config.shapeChecking = 0
+    
+    # Styles are built once per process rather than on every report
+    STYLES = getSampleStyleSheet()
+    
+    STATUTE_STYLE = ParagraphStyle(
+        "StatuteStyle",
+        parent=STYLES["Normal"],
+        backColor=colors.lightblue,
+        borderPadding=5,
+        borderColor=colors.blue,
+        borderWidth=1,
+        borderRadius=5
+    )
+    
+    DISCREPANCY_STYLE = ParagraphStyle(
+        "DiscrepancyStyle",
+        parent=STYLES["Normal"],
+        textColor=colors.red,
+        backColor=colors.lightpink,
+        borderPadding=5
+    )
+    
+    STATUTE_TABLE_STYLE = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ])
+    
+    STATUTE_TABLE_HEADER = ("Statute ID", "Referenced Text", "Match Type")
+    STATUTE_TABLE_COL_WIDTHS = (1.5 * inch, 3 * inch, 1 * inch)
+
+def _json_default(obj: Any) -> Any:
+    """Serialize values the JSON encoders don't handle natively"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if hasattr(obj, "tolist"):
+        # numpy scalars and arrays
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _as_dict(obj: Any) -> Dict[str, Any]:
+    """Convert a Pydantic model or plain object to a dictionary"""
+    if isinstance(obj, dict):
+        return obj
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    return dict(vars(obj)) if hasattr(obj, "__dict__") else {}
+
+def _truncate_statute_text(comp: Dict[str, Any], limit: int) -> Dict[str, Any]:
+    """Return the comparison with its statute text cut to at most limit characters"""
+    statute_text = comp.get("statute_text") or ""
+    if len(statute_text) <= limit:
+        return comp
+    return {**comp, "statute_text": statute_text[:limit] + "..."}
+
+def _normalize_transcription(item: Any, statute_text_limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Convert a transcription and its statute lists to plain dictionaries once up front
+    
+    Args:
+        item: Transcription response object or dictionary
+        statute_text_limit: If given, truncate each comparison's statute text to this many characters
+        
+    Returns:
+        Transcription dictionary whose statutes and comparisons are dictionaries too
+    """
+    if isinstance(item, BaseModel):
+        # model_dump() already converts the nested statute models to dictionaries
+        item = item.model_dump()
+        statutes = item.get("statutes") or []
+        comparisons = item.get("statute_comparisons") or []
+    else:
+        item = _as_dict(item)
+        statutes = [_as_dict(statute) for statute in item.get("statutes") or []]
+        comparisons = [_as_dict(comp) for comp in item.get("statute_comparisons") or []]
+    if statute_text_limit is not None:
+        comparisons = [_truncate_statute_text(comp, statute_text_limit) for comp in comparisons]
+    return {
+        **item,
+        "statutes": statutes,
+        "statute_comparisons": comparisons
+    }
+
+# Buffer for JSON reports written to disk, so the per-hearing writes are batched
+REPORT_WRITE_BUFFER = 1024 * 1024
+
+def _dumps_report(report: Any) -> bytes:
+    """Serialize a report value to indented JSON bytes"""
+    if HAS_ORJSON:
+        return orjson.dumps(
+            report,
+            default=_json_default,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+    return json.dumps(report, indent=2, default=_json_default).encode("utf-8")
+
+def _dumps_nested(value: Any, depth: int) -> bytes:
+    """Serialize a value indented to sit depth levels deep in the report"""
+    # Raw newlines only appear between tokens, never inside JSON strings
+    return _dumps_report(value).replace(b"\n", b"\n" + b"  " * depth)
+
+def _json_key(key: Any) -> str:
+    """Convert a dictionary key to the string json.dumps writes for it"""
+    if isinstance(key, str):
+        return key
+    if key is None:
+        return "null"
+    if isinstance(key, bool):
+        return "true" if key else "false"
+    return str(key)
+
+_report_executor: Optional[ProcessPoolExecutor] = None
+
+def start_report_workers() -> None:
+    """Start the report worker pool; called when the app starts"""
+    global _report_executor
+    if _report_executor is None:
+        # Spawn rather than fork so workers don't inherit the API's Whisper and HTTP threads
+        _report_executor = ProcessPoolExecutor(
+            max_workers=REPORT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+def shutdown_report_workers() -> None:
+    """Stop the report worker pool; called when the app shuts down"""
+    global _report_executor
+    if _report_executor is not None:
+        _report_executor.shutdown(wait=True, cancel_futures=True)
+        _report_executor = None
+
+# Report generator used inside each worker process
+_worker_generator = None
+
+def _render_report(report_format: str, transcription_data: List[Dict[str, Any]],
+                   metadata: Optional[Dict[str, Any]], in_memory: bool):
+    """
+    Render a report from normalized transcription dictionaries
+    
+    Runs in a report worker process, or in a thread when the pool isn't running.
+    Reports written to disk are not evicted here; the caller does that in the
+    API process, which sees every report.
+    
+    Returns:
+        (filename, report bytes) when in_memory, otherwise the report's file path
+    """
+    global _worker_generator
+    if _worker_generator is None:
+        _worker_generator = ReportGenerator()
+    generate = (_worker_generator.generate_pdf_report if report_format == "pdf"
+                else _worker_generator.generate_json_report)
+    
+    if in_memory:
+        buffer = io.BytesIO()
+        filename = generate(transcription_data, metadata, buffer)
+        return filename, buffer.getvalue()
+    return generate(transcription_data, metadata, evict=False)
+
 class ReportGenerator:
     """
     Service for generating reports from CourtCaseVibe transcription data
@@ -31,98 +224,237 @@ class ReportGenerator:
         self.reports_dir = Path(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))) / "reports"
         self.reports_dir.mkdir(exist_ok=True)
         
+        # Running totals of the reports on disk, so the directory is only scanned
+        # when a new report may have pushed it past a limit. None until the first scan.
+        self._eviction_lock = threading.Lock()
+        self._report_count = None
+        self._report_bytes = 0
+    
+    def _record_report(self, filepath: Path) -> None:
+        """Count a newly written report and evict old ones if a limit may be exceeded"""
+        size = filepath.stat().st_size
+        with self._eviction_lock:
+            if self._report_count is not None:
+                self._report_count += 1
+                self._report_bytes += size
+                if self._report_count <= MAX_REPORT_COUNT and self._report_bytes <= MAX_REPORT_BYTES:
+                    return
+            self._evict_old_reports(keep=filepath)
+    
+    def _evict_old_reports(self, keep: Path) -> None:
+        """
+        Delete the least recently used reports beyond MAX_REPORT_COUNT or MAX_REPORT_BYTES
+        
+        Args:
+            keep: Report that was just written; it is never deleted, even if it
+                exceeds MAX_REPORT_BYTES on its own
+        """
+        entries = []
+        with os.scandir(self.reports_dir) as it:
+            for entry in it:
+                if entry.name.startswith(REPORT_FILENAME_PREFIX) and entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        
+        # Oldest first
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for _, size, path in entries:
+            if count <= MAX_REPORT_COUNT and total_bytes <= MAX_REPORT_BYTES:
+                break
+            if os.path.basename(path) == keep.name:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            count -= 1
+            total_bytes -= size
+        
+        self._report_count = count
+        self._report_bytes = total_bytes
+        
+    def _group_by_hearing_date(self, transcription_data: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Group transcriptions by hearing date, keeping the order dates first appear in
+        
+        Args:
+            transcription_data: List of normalized transcription dictionaries
+            
+        Returns:
+            Dictionary mapping each hearing date to its transcriptions
+        """
+        hearing_dates = {}
+        for item in transcription_data:
+            hearing_dates.setdefault(item.get("hearing_date", "unknown"), []).append(item)
+        return hearing_dates
+    
     def generate_json_report(self, transcription_data: List[Dict[str, Any]], 
-                            metadata: Dict[str, Any] = None) -> str:
+                            metadata: Dict[str, Any] = None,
+                            output: Optional[BinaryIO] = None,
+                            evict: bool = True) -> str:
         """
         Generate a JSON report from transcription data
         
         Args:
             transcription_data: List of transcription response objects
             metadata: Additional metadata to include in the report
+            output: Binary stream to write the report to instead of the reports directory
+            evict: Whether to delete old reports once this one is written
             
         Returns:
-            File path of the generated JSON report
+            File path of the generated JSON report, or just its filename when written to output
         """
-        # Create report data structure
-        report = {
-            "report_type": "CourtCaseVibe Transcription & Statute Analysis",
-            "generated_at": datetime.datetime.now().isoformat(),
-            "metadata": metadata or {},
-            "hearings": {}  # Group by hearing date
-        }
-        
-        # Process each transcription and group by hearing date
-        for item in transcription_data:
-            # Get hearing date and ensure it's a string
-            hearing_date = item.get("hearing_date", "unknown") if isinstance(item, dict) else getattr(item, "hearing_date", "unknown")
-            
-            # Initialize hearing entry if it doesn't exist
-            if hearing_date not in report["hearings"]:
-                report["hearings"][hearing_date] = []
-            
-            # For each transcription, create a summary of statutes and comparisons
-            statute_refs = []
-            if "statutes" in item or hasattr(item, "statutes"):
-                statutes = item.get("statutes", []) if isinstance(item, dict) else getattr(item, "statutes", [])
-                for statute in statutes:
-                    # Convert Pydantic model to dict if needed
-                    if hasattr(statute, "dict"):
-                        statute_refs.append(statute.dict())
-                    else:
-                        statute_refs.append(statute)
-            
-            # Process statute comparisons
-            comparisons = []
-            if "statute_comparisons" in item or hasattr(item, "statute_comparisons"):
-                comps = item.get("statute_comparisons", []) if isinstance(item, dict) else getattr(item, "statute_comparisons", [])
-                for comp in comps:
-                    # Convert Pydantic model to dict if needed
-                    if hasattr(comp, "dict"):
-                        comparisons.append(comp.dict())
-                    else:
-                        comparisons.append(comp)
-            
-            # Add transcription data
-            transcription_entry = {
-                "file_id": item.get("file_id", "unknown") if isinstance(item, dict) else getattr(item, "file_id", "unknown"),
-                "transcription": item.get("transcription", "") if isinstance(item, dict) else getattr(item, "transcription", ""),
-                "statute_references": statute_refs,
-                "statute_comparisons": comparisons
-            }
-            
-            report["hearings"][hearing_date].append(transcription_entry)
+        now = datetime.datetime.now()
+        transcription_data = [_normalize_transcription(item) for item in transcription_data]
         
         # Generate filename with timestamp
-        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        filename = f"courtcasevibe_report_{timestamp}.json"
-        filepath = self.reports_dir / filename
+        timestamp = now.strftime("%Y%m%d%H%M%S")
+        filename = f"{REPORT_FILENAME_PREFIX}{timestamp}.json"
+        
+        if output is not None:
+            self._write_json_report(output, transcription_data, metadata, now)
+            return filename
         
         # Write to file
-        with open(filepath, "w") as f:
-            json.dump(report, f, indent=2)
+        filepath = self.reports_dir / filename
+        with open(filepath, "wb", buffering=REPORT_WRITE_BUFFER) as f:
+            self._write_json_report(f, transcription_data, metadata, now)
+        if evict:
+            self._record_report(filepath)
         
         return str(filepath)
     
+    def _write_json_report(self, output: BinaryIO, transcription_data: List[Dict[str, Any]],
+                           metadata: Optional[Dict[str, Any]], now: datetime.datetime) -> None:
+        """
+        Write a JSON report one hearing date at a time
+        
+        Only one hearing's entries are serialized at once, so the whole report
+        never has to be held in memory as a single dictionary or string.
+        
+        Args:
+            output: Binary stream to write the report to
+            transcription_data: List of normalized transcription dictionaries
+            metadata: Additional metadata to include in the report
+            now: Time the report was generated
+        """
+        output.write(b'{\n  "report_type": ')
+        output.write(_dumps_report("CourtCaseVibe Transcription & Statute Analysis"))
+        output.write(b',\n  "generated_at": ')
+        output.write(_dumps_report(now.isoformat()))
+        output.write(b',\n  "metadata": ')
+        output.write(_dumps_nested(metadata or {}, 1))
+        output.write(b',\n  "hearings": {')
+        
+        # Process each transcription grouped by hearing date
+        hearing_dates = self._group_by_hearing_date(transcription_data)
+        for date_index, (hearing_date, items) in enumerate(hearing_dates.items()):
+            output.write(b",\n    " if date_index > 0 else b"\n    ")
+            output.write(_dumps_report(_json_key(hearing_date)))
+            output.write(b": ")
+            output.write(_dumps_nested([self._json_transcription_entry(item) for item in items], 2))
+        
+        output.write(b"\n  }\n}" if hearing_dates else b"}\n}")
+    
+    def _json_transcription_entry(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the JSON report entry for a single transcription
+        
+        Args:
+            item: Normalized transcription dictionary
+            
+        Returns:
+            Dictionary with the transcription, statute references and comparisons
+        """
+        return {
+            "file_id": item.get("file_id", "unknown"),
+            "transcription": item.get("transcription", ""),
+            "statute_references": item["statutes"],
+            "statute_comparisons": item["statute_comparisons"]
+        }
+    
+    async def _render_async(self, report_format: str, transcription_data: List[Any],
+                            metadata: Optional[Dict[str, Any]], in_memory: bool):
+        """Render a report in a worker process, or a worker thread if the pool isn't running"""
+        # Only plain dictionaries are sent to the worker; PDF reports quote at most
+        # PDF_STATUTE_TEXT_LIMIT characters of each statute, so cut them here
+        statute_text_limit = PDF_STATUTE_TEXT_LIMIT if report_format == "pdf" else None
+        data = [_normalize_transcription(item, statute_text_limit) for item in transcription_data]
+        
+        args = (report_format, data, metadata, in_memory)
+        if _report_executor is None:
+            return await asyncio.to_thread(_render_report, *args)
+        return await asyncio.get_running_loop().run_in_executor(_report_executor, _render_report, *args)
+    
+    async def _render_to_file_async(self, report_format: str, transcription_data: List[Any],
+                                    metadata: Optional[Dict[str, Any]]) -> str:
+        """Render a report to the reports directory and evict old reports"""
+        report_path = await self._render_async(report_format, transcription_data, metadata, False)
+        await asyncio.to_thread(self._record_report, Path(report_path))
+        return report_path
+    
+    async def generate_json_report_async(self, transcription_data: List[Dict[str, Any]],
+                                         metadata: Dict[str, Any] = None) -> str:
+        """
+        Generate a JSON report in a worker process without blocking the event loop
+        
+        Args:
+            transcription_data: List of transcription response objects
+            metadata: Additional metadata to include in the report
+            
+        Returns:
+            File path of the generated JSON report
+        """
+        return await self._render_to_file_async("json", transcription_data, metadata)
+    
+    async def generate_pdf_report_async(self, transcription_data: List[Dict[str, Any]],
+                                        metadata: Dict[str, Any] = None) -> str:
+        """
+        Generate a PDF report in a worker process without blocking the event loop
+        
+        Args:
+            transcription_data: List of transcription response objects
+            metadata: Additional metadata to include in the report
+            
+        Returns:
+            File path of the generated PDF report
+        """
+        return await self._render_to_file_async("pdf", transcription_data, metadata)
+    
+    async def export_report_async(self, report_format: str, transcription_data: List[Dict[str, Any]],
+                                  metadata: Dict[str, Any] = None) -> Tuple[str, bytes]:
+        """
+        Generate a report in memory in a worker process, without storing it on disk
+        
+        Args:
+            report_format: 'json' or 'pdf'
+            transcription_data: List of transcription response objects
+            metadata: Additional metadata to include in the report
+            
+        Returns:
+            Tuple of the report's filename and its contents
+        """
+        return await self._render_async(report_format, transcription_data, metadata, True)
+    
     def generate_pdf_report(self, transcription_data: List[Dict[str, Any]],
-                          metadata: Dict[str, Any] = None) -> str:
+                          metadata: Dict[str, Any] = None,
+                          output: Optional[BinaryIO] = None,
+                          evict: bool = True) -> str:
         """
         Generate a PDF report from transcription data
         
         Args:
             transcription_data: List of transcription response objects
             metadata: Additional metadata to include in the report
+            output: Binary stream to write the report to instead of the reports directory
+            evict: Whether to delete old reports once this one is written
             
         Returns:
-            File path of the generated PDF report
+            File path of the generated PDF report, or just its filename when written to output
         """
-        # Double-check ReportLab is available at runtime
-        try:
-            from reportlab.lib.pagesizes import letter
-            from reportlab.lib import colors
-            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-            from reportlab.lib.units import inch
-        except ImportError:
+        if not HAS_REPORTLAB:
             error_msg = (
                 "ReportLab is required for PDF generation but is not installed or properly configured.\n"
                 "To fix this issue, please run the following command in your terminal:\n"
@@ -133,14 +465,17 @@ class ReportGenerator:
             print(error_msg, file=sys.stderr)
             raise ImportError("ReportLab is required for PDF generation. Install with: pip install reportlab")
         
+        # Read the clock once so the filename and the "Generated" line agree
+        now = datetime.datetime.now()
+        
         # Generate filename with timestamp
-        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        filename = f"courtcasevibe_report_{timestamp}.pdf"
+        timestamp = now.strftime("%Y%m%d%H%M%S")
+        filename = f"{REPORT_FILENAME_PREFIX}{timestamp}.pdf"
         filepath = self.reports_dir / filename
         
         # Create PDF document
         doc = SimpleDocTemplate(
-            str(filepath),
+            output if output is not None else str(filepath),
             pagesize=letter,
             rightMargin=72,
             leftMargin=72,
@@ -149,31 +484,9 @@ class ReportGenerator:
         )
         
         # Styles
-        styles = getSampleStyleSheet()
-        title_style = styles["Title"]
-        heading_style = styles["Heading1"]
-        subheading_style = styles["Heading2"]
-        date_heading_style = styles["Heading3"] 
-        normal_style = styles["Normal"]
-        
-        # Custom styles
-        statute_style = ParagraphStyle(
-            "StatuteStyle",
-            parent=normal_style,
-            backColor=colors.lightblue,
-            borderPadding=5,
-            borderColor=colors.blue,
-            borderWidth=1,
-            borderRadius=5
-        )
-        
-        discrepancy_style = ParagraphStyle(
-            "DiscrepancyStyle",
-            parent=normal_style,
-            textColor=colors.red,
-            backColor=colors.lightpink,
-            borderPadding=5
-        )
+        title_style = STYLES["Title"]
+        heading_style = STYLES["Heading1"]
+        normal_style = STYLES["Normal"]
         
         # Build document content
         content = []
@@ -186,170 +499,140 @@ class ReportGenerator:
         if metadata:
             content.append(Paragraph("Report Metadata", heading_style))
             for key, value in metadata.items():
-                content.append(Paragraph(f"<b>{key}:</b> {value}", normal_style))
+                content.append(Paragraph(f"<b>{escape(str(key))}:</b> {escape(str(value))}", normal_style))
             content.append(Spacer(1, 0.25 * inch))
         
         # Date & Time
-        current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        current_time = now.strftime("%Y-%m-%d %H:%M:%S")
         content.append(Paragraph(f"Generated: {current_time}", normal_style))
         content.append(Spacer(1, 0.5 * inch))
         
         # Group transcriptions by hearing date
-        hearing_dates = {}
-        for item in transcription_data:
-            # Get hearing date
-            hearing_date = item.get("hearing_date", "unknown") if isinstance(item, dict) else getattr(item, "hearing_date", "unknown")
-            
-            if hearing_date not in hearing_dates:
-                hearing_dates[hearing_date] = []
-                
-            hearing_dates[hearing_date].append(item)
+        transcription_data = [
+            _normalize_transcription(item, statute_text_limit=PDF_STATUTE_TEXT_LIMIT)
+            for item in transcription_data
+        ]
+        hearing_dates = self._group_by_hearing_date(transcription_data)
         
-        # Process each hearing date group
-        for date, items in hearing_dates.items():
+        # Process each hearing date group, starting each one on a new page
+        for date_index, (date, items) in enumerate(hearing_dates.items()):
+            if date_index > 0:
+                content.append(PageBreak())
+            
             # Hearing date section header
-            content.append(Paragraph(f"Hearing Date: {date}", heading_style))
+            content.append(Paragraph(f"Hearing Date: {escape(str(date))}", heading_style))
             content.append(Spacer(1, 0.25 * inch))
             
             # Process each transcription within this hearing date
             for i, item in enumerate(items):
-                # Convert item to dict if it's not already
-                item_dict = item if isinstance(item, dict) else item.__dict__ if hasattr(item, '__dict__') else {}
-                
-                # Transcription section
-                content.append(Paragraph(f"Transcription #{i+1}", subheading_style))
-                
-                file_id = item_dict.get('file_id', 'unknown')
-                if hasattr(item, 'file_id'):
-                    file_id = item.file_id
-                
-                truncated_id = file_id[:8] if isinstance(file_id, str) and len(file_id) > 8 else file_id
-                content.append(Paragraph(f"<b>File ID:</b> {truncated_id}...", normal_style))
-                content.append(Spacer(1, 0.25 * inch))
-                
-                # Transcription text
-                transcription = item_dict.get('transcription', '')
-                if hasattr(item, 'transcription'):
-                    transcription = item.transcription
-                    
-                content.append(Paragraph("Full Transcription:", subheading_style))
-                content.append(Paragraph(transcription, normal_style))
-                content.append(Spacer(1, 0.25 * inch))
-                
-                # Statutes section
-                statutes = item_dict.get('statutes', [])
-                if hasattr(item, 'statutes'):
-                    statutes = item.statutes
-                    
-                if statutes:
-                    content.append(Paragraph(f"Statute References Found ({len(statutes)})", subheading_style))
-                    
-                    # Create table of statute references
-                    statute_data = [["Statute ID", "Referenced Text", "Match Type"]]
-                    for statute in statutes:
-                        statute_id = statute.get('statute_id', '') if isinstance(statute, dict) else getattr(statute, 'statute_id', '')
-                        statute_text = statute.get('text', '') if isinstance(statute, dict) else getattr(statute, 'text', '')
-                        match_type = statute.get('match_type', '') if isinstance(statute, dict) else getattr(statute, 'match_type', '')
-                        
-                        statute_data.append([
-                            statute_id,
-                            statute_text,
-                            match_type
-                        ])
-                    
-                    statute_table = Table(statute_data, colWidths=[1.5*inch, 3*inch, 1*inch])
-                    statute_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
-                        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-                        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                        ('FONTSIZE', (0, 0), (-1, 0), 10),
-                        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                    ]))
-                    
-                    content.append(statute_table)
-                    content.append(Spacer(1, 0.25 * inch))
-                
-                # Comparisons section
-                comparisons = item_dict.get('statute_comparisons', [])
-                if hasattr(item, 'statute_comparisons'):
-                    comparisons = item.statute_comparisons
-                    
-                if comparisons:
-                    content.append(Paragraph("Statute Verification Results", subheading_style))
-                    
-                    for comp in comparisons:
-                        # Handle both dict and object cases
-                        if isinstance(comp, dict):
-                            statute_id = comp.get('statute_id', '')
-                            similarity_score = comp.get('similarity_score', 0)
-                            is_discrepancy = comp.get('is_discrepancy', False)
-                            transcript_text = comp.get('transcript_text', '')
-                            statute_text = comp.get('statute_text', '')
-                            url = comp.get('url', '')
-                            title = comp.get('title', '')
-                            error = comp.get('error', '')
-                        else:
-                            statute_id = getattr(comp, 'statute_id', '')
-                            similarity_score = getattr(comp, 'similarity_score', 0)
-                            is_discrepancy = getattr(comp, 'is_discrepancy', False)
-                            transcript_text = getattr(comp, 'transcript_text', '')
-                            statute_text = getattr(comp, 'statute_text', '')
-                            url = getattr(comp, 'url', '')
-                            title = getattr(comp, 'title', '')
-                            error = getattr(comp, 'error', '')
-                        
-                        # Comparison header
-                        score_percent = f"{similarity_score * 100:.1f}%"
-                        if is_discrepancy:
-                            content.append(Paragraph(
-                                f"<b>Statute {statute_id}</b> - Similarity: {score_percent} "
-                                f"⚠️ <i>Potential Discrepancy</i>", 
-                                discrepancy_style
-                            ))
-                        else:
-                            content.append(Paragraph(
-                                f"<b>Statute {statute_id}</b> - Similarity: {score_percent} ✓ Verified", 
-                                normal_style
-                            ))
-                        
-                        # From hearing text
-                        content.append(Paragraph("<b>From Hearing:</b>", normal_style))
-                        content.append(Paragraph(f'"{transcript_text}"', normal_style))
-                        
-                        # From Florida Statutes
-                        content.append(Paragraph("<b>From Florida Statutes:</b>", normal_style))
-                        if error:
-                            content.append(Paragraph(error, discrepancy_style))
-                        else:
-                            if title:
-                                content.append(Paragraph(title, normal_style))
-                            
-                            # Truncate statute text if too long
-                            if len(statute_text) > 500:
-                                statute_text = statute_text[:500] + "..."
-                            
-                            content.append(Paragraph(statute_text, normal_style))
-                            content.append(Paragraph(
-                                f'<link href="{url}">View on Official Florida Statutes Website</link>',
-                                normal_style
-                            ))
-                        
-                        content.append(Spacer(1, 0.25 * inch))
+                content.extend(self._transcription_flowables(item, i))
                 
                 # Add spacing between transcriptions within a hearing
                 if i < len(items) - 1:
                     content.append(Spacer(1, 0.5 * inch))
-            
-            # Add a page break between hearing dates (except for the last one)
-            dates = list(hearing_dates.keys())
-            if date != dates[-1]:
-                content.append(Spacer(1, 0.5 * inch))
-                content.append(Paragraph("", normal_style))
-                content.append(Spacer(1, 0.5 * inch))
         
         # Build PDF
         doc.build(content)
+        if output is not None:
+            return filename
+        
+        if evict:
+            self._record_report(filepath)
         return str(filepath)
+    
+    def _transcription_flowables(self, item: Dict[str, Any], index: int):
+        """
+        Yield the PDF flowables for a single transcription
+        
+        Args:
+            item: Normalized transcription dictionary
+            index: Position of the transcription within its hearing date
+            
+        Yields:
+            ReportLab flowables for the transcription, its statutes and comparisons
+        """
+        subheading_style = STYLES["Heading2"]
+        normal_style = STYLES["Normal"]
+        
+        # Transcription section
+        yield Paragraph(f"Transcription #{index+1}", subheading_style)
+        
+        file_id = item.get('file_id', 'unknown')
+        
+        truncated_id = file_id[:8] if isinstance(file_id, str) and len(file_id) > 8 else file_id
+        yield Paragraph(f"<b>File ID:</b> {escape(str(truncated_id))}...", normal_style)
+        yield Spacer(1, 0.25 * inch)
+        
+        # Transcription text, escaped so the paragraph parser sees no stray markup
+        transcription = escape(item.get('transcription', ''))
+        yield Paragraph("Full Transcription:", subheading_style)
+        yield Paragraph(transcription, normal_style)
+        yield Spacer(1, 0.25 * inch)
+        
+        # Statutes section
+        statutes = item['statutes']
+        if statutes:
+            yield Paragraph(f"Statute References Found ({len(statutes)})", subheading_style)
+            
+            # Create table of statute references
+            statute_data = [STATUTE_TABLE_HEADER]
+            statute_data.extend(
+                (statute.get('statute_id', ''), statute.get('text', ''), statute.get('match_type', ''))
+                for statute in statutes
+            )
+            
+            statute_table = Table(statute_data, colWidths=STATUTE_TABLE_COL_WIDTHS)
+            statute_table.setStyle(STATUTE_TABLE_STYLE)
+            
+            yield statute_table
+            yield Spacer(1, 0.25 * inch)
+        
+        # Comparisons section
+        comparisons = item['statute_comparisons']
+        if comparisons:
+            yield Paragraph("Statute Verification Results", subheading_style)
+            
+            for comp in comparisons:
+                statute_id = escape(str(comp.get('statute_id', '')))
+                similarity_score = comp.get('similarity_score', 0)
+                is_discrepancy = comp.get('is_discrepancy', False)
+                transcript_text = comp.get('transcript_text', '')
+                statute_text = comp.get('statute_text', '')
+                url = escape(comp.get('url', ''), {'"': '&quot;'})
+                title = comp.get('title', '')
+                error = comp.get('error', '')
+                
+                # Comparison header
+                score_percent = f"{similarity_score * 100:.1f}%"
+                if is_discrepancy:
+                    yield Paragraph(
+                        f"<b>Statute {statute_id}</b> - Similarity: {score_percent} "
+                        f"⚠️ <i>Potential Discrepancy</i>", 
+                        DISCREPANCY_STYLE
+                    )
+                else:
+                    yield Paragraph(
+                        f"<b>Statute {statute_id}</b> - Similarity: {score_percent} ✓ Verified", 
+                        normal_style
+                    )
+                
+                # From hearing text
+                yield Paragraph("<b>From Hearing:</b>", normal_style)
+                yield Paragraph(f'"{escape(transcript_text)}"', normal_style)
+                
+                # From Florida Statutes
+                yield Paragraph("<b>From Florida Statutes:</b>", normal_style)
+                if error:
+                    yield Paragraph(escape(error), DISCREPANCY_STYLE)
+                else:
+                    if title:
+                        yield Paragraph(escape(title), normal_style)
+                    
+                    # Statute text was already truncated when the input was normalized
+                    yield Paragraph(escape(statute_text), normal_style)
+                    yield Paragraph(
+                        f'<link href="{url}">View on Official Florida Statutes Website</link>',
+                        normal_style
+                    )
+                
+                yield Spacer(1, 0.25 * inch)
@@ -1,6 +1,22 @@
 import re
-import spacy
-from typing import List, Dict, Any, Tuple
+import html
+import bisect
+from typing import List, Dict, Any, Optional, Tuple
+
+# SpaCy NER is an optional second pass on top of the regex patterns
+HAS_SPACY = True
+try:
+    import spacy
+except ImportError:
+    HAS_SPACY = False
+
+# RE2 scans in linear time with no backtracking; fall back to the stdlib if it's missing
+HAS_RE2 = True
+try:
+    import re2 as statute_re
+except ImportError:
+    statute_re = re
+    HAS_RE2 = False
 
 # Pattern to match statute references like "Section 32B" or "s. 123.45"
 STATUTE_PATTERNS = [
@@ -13,28 +29,80 @@ STATUTE_PATTERNS = [
     r'\bF\.S\.\s+[§]?\s*(\d+[A-Za-z]?(?:\.\d+)?)'      # "F.S. § 123" or "F.S. 123.45"
 ]
 
-class StatuteExtractor:
-    def __init__(self):
-        """Initialize the StatuteExtractor with a SpaCy NER model"""
+# Only doc.ents is used, and en_core_web_sm's NER has its own tok2vec layer,
+# so the rest of the pipeline can be left out entirely
+UNUSED_SPACY_PIPES = ["tok2vec", "tagger", "parser", "senter", "attribute_ruler", "lemmatizer"]
+
+# Every statute reference contains a digit, so text without one can skip extraction
+STATUTE_HINT_PATTERN = re.compile(r'\d')
+
+# Helpers for classifying SpaCy entities, compiled once rather than looked up per entity
+STATUTE_ID_PATTERN = re.compile(r'(\d+[A-Za-z]?(?:\.\d+)?(?:-\d+)?)')
+# Legal keywords (matched anywhere in the entity) or a decimal number like "316.193"
+STATUTE_KEYWORD_PATTERN = re.compile(
+    r'section|statute|chapter|code|title|law|act|\d+\.\d+',
+    re.IGNORECASE
+)
+
+# The SpaCy model is shared by every extractor and loaded at most once per process
+_nlp = None
+
+def load_spacy_model():
+    """
+    Load the SpaCy NER model the first time it is needed
+    
+    Raises:
+        ImportError: If SpaCy isn't installed
+        RuntimeError: If the en_core_web_sm model isn't installed
+    """
+    global _nlp
+    if _nlp is None:
+        if not HAS_SPACY:
+            raise ImportError("SpaCy is required for NER statute extraction. Install with: pip install spacy")
+        
         # Load SpaCy model - we'll use the English model and extend it with custom rules
         # For production use, a custom-trained legal NER model would be better
         try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            # If model isn't installed, download it
-            import subprocess
-            subprocess.run(["python", "-m", "spacy", "download", "en_core_web_sm"])
-            self.nlp = spacy.load("en_core_web_sm")
+            _nlp = spacy.load("en_core_web_sm", exclude=UNUSED_SPACY_PIPES)
+        except OSError as e:
+            raise RuntimeError(
+                "SpaCy model en_core_web_sm is not installed. Run: python -m spacy download en_core_web_sm"
+            ) from e
+    return _nlp
+
+class StatuteExtractor:
+    def __init__(self, use_ner: bool = False):
+        """
+        Initialize the StatuteExtractor
+        
+        Args:
+            use_ner: Also run SpaCy NER to catch references the regex patterns miss.
+                The SpaCy model is only loaded when this is enabled.
+        """
+        self.use_ner = use_ner
+        self.nlp = load_spacy_model() if use_ner else None
             
-        # Compile the regex patterns for faster matching
-        self.patterns = [re.compile(pattern, re.IGNORECASE) for pattern in STATUTE_PATTERNS]
+        # Compile the patterns into one alternation so the text is scanned once.
+        # Each pattern has exactly one capturing group, so the group that
+        # matched (lastindex) holds the statute ID.
+        # The case-insensitive flag is inline so RE2 and re treat it the same way.
+        self.pattern = statute_re.compile(
+            "(?i)" + "|".join(f"(?:{pattern})" for pattern in STATUTE_PATTERNS)
+        )
         
-    def extract_statutes(self, text: str) -> List[Dict[str, Any]]:
+    def _get_nlp(self):
+        """Load the SpaCy model the first time NER is needed"""
+        if self.nlp is None:
+            self.nlp = load_spacy_model()
+        return self.nlp
+    
+    def extract_statutes(self, text: str, use_ner: Optional[bool] = None) -> List[Dict[str, Any]]:
         """
         Extract statute references from the given text
         
         Args:
             text: The transcription text to analyze
+            use_ner: Override whether to run the SpaCy NER pass; defaults to the extractor's setting
             
         Returns:
             A list of dictionaries with statute information, including:
@@ -43,14 +111,35 @@ class StatuteExtractor:
             - end_idx: End position in the text
             - text: The original text matched
         """
-        statutes = []
+        return self.extract_statutes_batch([text], use_ner=use_ner)[0]
+    
+    def extract_statutes_batch(self, texts: List[str], batch_size: int = 32,
+                               use_ner: Optional[bool] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Extract statute references from several texts at once
+        
+        The SpaCy pass streams all texts through nlp.pipe, which is much
+        cheaper than calling the pipeline once per transcript.
+        
+        Args:
+            texts: The transcription texts to analyze
+            batch_size: Number of texts SpaCy processes per batch
+            use_ner: Override whether to run the SpaCy NER pass; defaults to the extractor's setting
+            
+        Returns:
+            One list of statutes per input text, in the same format as extract_statutes
+        """
+        results = [[] for _ in texts]
+        
+        # Cheap pre-filter before running the regex and SpaCy passes
+        candidates = [i for i, text in enumerate(texts) if STATUTE_HINT_PATTERN.search(text)]
         
         # Use regex patterns to find statute mentions
-        for pattern in self.patterns:
-            for match in pattern.finditer(text):
-                statute_id = match.group(1)
+        for i in candidates:
+            for match in self.pattern.finditer(texts[i]):
+                statute_id = match.group(match.lastindex)
                 
-                statutes.append({
+                results[i].append({
                     "statute_id": statute_id,
                     "start_idx": match.start(),
                     "end_idx": match.end(),
@@ -58,47 +147,59 @@ class StatuteExtractor:
                     "match_type": "regex"
                 })
         
+        if use_ner is None:
+            use_ner = self.use_ner
+        if not use_ner:
+            return results
+        
         # Use SpaCy for additional entity extraction
-        doc = self.nlp(text)
-        
-        # Look for specific entity types that might indicate legal references
-        for ent in doc.ents:
-            if ent.label_ in ["LAW", "ORG", "CARDINAL"] and self._looks_like_statute(ent.text):
-                # Check if this entity overlaps with any regex matches
-                if not any(self._overlaps(ent.start_char, ent.end_char, s["start_idx"], s["end_idx"]) for s in statutes):
-                    # Extract the statute number if possible
-                    statute_id = self._extract_statute_id(ent.text)
-                    if statute_id:
-                        statutes.append({
-                            "statute_id": statute_id,
-                            "start_idx": ent.start_char,
-                            "end_idx": ent.end_char,
-                            "text": ent.text,
-                            "match_type": "spacy"
-                        })
-        
-        # Sort by position in text
-        statutes.sort(key=lambda x: x["start_idx"])
-        
-        return statutes
+        docs = self._get_nlp().pipe((texts[i] for i in candidates), batch_size=batch_size)
+        
+        for i, doc in zip(candidates, docs):
+            statutes = results[i]
+            # Regex matches come out of finditer in order and never overlap,
+            # so both their starts and their ends are sorted
+            regex_starts = [s["start_idx"] for s in statutes]
+            regex_ends = [s["end_idx"] for s in statutes]
+            
+            # Look for specific entity types that might indicate legal references
+            for ent in doc.ents:
+                if ent.label_ in ["LAW", "ORG", "CARDINAL"] and self._looks_like_statute(ent.text):
+                    # Check if this entity overlaps with any regex matches
+                    if not self._overlaps_any(regex_starts, regex_ends, ent.start_char, ent.end_char):
+                        # Extract the statute number if possible
+                        statute_id = self._extract_statute_id(ent.text)
+                        if statute_id:
+                            statutes.append({
+                                "statute_id": statute_id,
+                                "start_idx": ent.start_char,
+                                "end_idx": ent.end_char,
+                                "text": ent.text,
+                                "match_type": "spacy"
+                            })
+            
+            # Sort by position in text
+            statutes.sort(key=lambda x: x["start_idx"])
+        
+        return results
     
     def _looks_like_statute(self, text: str) -> bool:
         """Check if the text looks like it might contain a statute reference"""
-        lower_text = text.lower()
-        keywords = ["section", "statute", "chapter", "code", "title", "law", "act"]
-        return any(keyword in lower_text for keyword in keywords) or re.search(r'\d+\.\d+', text) is not None
+        return STATUTE_KEYWORD_PATTERN.search(text) is not None
     
     def _extract_statute_id(self, text: str) -> str:
         """Try to extract a statute ID from text that might contain one"""
         # Look for number patterns that might be statute IDs
-        match = re.search(r'(\d+[A-Za-z]?(?:\.\d+)?(?:-\d+)?)', text)
+        match = STATUTE_ID_PATTERN.search(text)
         if match:
             return match.group(1)
         return ""
     
-    def _overlaps(self, start1: int, end1: int, start2: int, end2: int) -> bool:
-        """Check if two spans (start,end) overlap"""
-        return max(start1, start2) < min(end1, end2)
+    def _overlaps_any(self, starts: List[int], ends: List[int], start: int, end: int) -> bool:
+        """Check if the span (start,end) overlaps any of the sorted, disjoint spans given by starts and ends"""
+        # The first span ending after our start is the only one that can overlap
+        i = bisect.bisect_right(ends, start)
+        return i < len(starts) and starts[i] < end
     
     def get_highlighted_text(self, text: str, statutes: List[Dict[str, Any]]) -> str:
         """
@@ -111,31 +212,30 @@ class StatuteExtractor:
         Returns:
             HTML string with statute references wrapped in highlight spans
         """
-        # Sort statutes by position in reverse order (to avoid index shifting)
-        sorted_statutes = sorted(statutes, key=lambda x: x["start_idx"], reverse=True)
+        # Walk the statutes in text order and build the output in one pass
+        sorted_statutes = sorted(statutes, key=lambda x: x["start_idx"])
         
-        # Create a copy of the text that we'll modify
-        highlighted_text = text
+        parts = []
+        cursor = 0
         
-        # Insert highlight tags around each statute mention
+        # Wrap each statute mention in a highlight span
         for statute in sorted_statutes:
             start, end = statute["start_idx"], statute["end_idx"]
-            statute_id = statute["statute_id"]
             
-            # Create the highlighted span with data attribute for the statute ID
-            highlight_open = f'<span class="statute-reference" data-statute-id="{statute_id}">'
-            highlight_close = '</span>'
+            # Skip mentions that overlap one that is already highlighted
+            if start < cursor:
+                continue
             
-            # Insert the highlight tags
-            highlighted_text = (
-                highlighted_text[:start] + 
-                highlight_open + 
-                highlighted_text[start:end] + 
-                highlight_close + 
-                highlighted_text[end:]
-            )
-        
-        return highlighted_text
+            # Create the highlighted span with data attribute for the statute ID
+            statute_id = html.escape(statute["statute_id"], quote=True)
+            parts.append(text[cursor:start])
+            parts.append(f'<span class="statute-reference" data-statute-id="{statute_id}">')
+            parts.append(text[start:end])
+            parts.append('</span>')
+            cursor = end
+        
+        parts.append(text[cursor:])
+        return "".join(parts)
     
     def get_highlighted_json(self, text: str) -> Tuple[List[Dict[str, Any]], str]:
         """
@@ -3,41 +3,225 @@ import re
 import json
 import time
 import sqlite3
+import threading
+from collections import OrderedDict
+from functools import lru_cache, partial
+from concurrent.futures import ThreadPoolExecutor, Future, wait
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
-from typing import Dict, List, Tuple, Optional, Any
+from typing import Dict, List, Tuple, Optional, Any, MutableMapping
 from datetime import datetime, timedelta
 from sentence_transformers import SentenceTransformer
 import numpy as np
 
+# lxml's C parser is several times faster than the pure-Python html.parser
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# SimSIMD has SIMD kernels for small float32 vectors; fall back to NumPy if it's missing
+HAS_SIMSIMD = True
+try:
+    import simsimd
+except ImportError:
+    HAS_SIMSIMD = False
+
 # Base URL for Florida Statutes
 FL_STATUTES_BASE_URL = "http://www.leg.state.fl.us/statutes"
 CACHE_EXPIRY = 30  # Cache expiry in days
+MEMORY_CACHE_SIZE = 1024  # Statutes kept in memory in front of the SQLite cache
+REQUEST_TIMEOUT = 10  # Seconds to wait for the statutes website
+HTTP_POOL_SIZE = 16  # Keep-alive connections held open to the statutes website
+STATUTE_FETCH_WORKERS = 8  # Statutes fetched from the website at the same time
+STATUTE_URL_CACHE_SIZE = 4096  # Statute IDs whose URLs are memoized
+EMBEDDING_BATCH_SIZE = 32  # Texts per forward pass when encoding statutes in bulk
+EMBEDDING_WORKERS = 2  # Background threads encoding newly cached statutes
+EMBEDDING_NORM_TOLERANCE = 1e-4  # Squared norms further than this from 1 are renormalized
+
+# Leading chapter number of a statute ID such as "32B"
+_CHAPTER_RE = re.compile(r'\d+')
+
+# Layouts of the statutes.embedding BLOB, recorded in statutes.embedding_format
+EMBEDDING_FORMAT_FLOAT32 = 0  # Raw float32 values
+EMBEDDING_FORMAT_INT8 = 1  # float32 scale followed by int8 values, a quarter of the size
+
+# Per-connection settings for the statute cache: commits only fsync at WAL
+# checkpoints, temp tables stay in memory, and reads go through a 256 MB
+# memory map and a 64 MB page cache
+SQLITE_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+)
+
+def _cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Cosine similarity of two embeddings"""
+    a = np.ascontiguousarray(a, dtype=np.float32)
+    b = np.ascontiguousarray(b, dtype=np.float32)
+    if HAS_SIMSIMD:
+        # simsimd.cosine returns the cosine distance
+        return 1.0 - float(simsimd.cosine(a, b))
+    return float(np.dot(a, b) / np.sqrt(np.vdot(a, a) * np.vdot(b, b)))
+
+def _dot(a: np.ndarray, b: np.ndarray) -> float:
+    """Dot product of two float32 embeddings"""
+    if HAS_SIMSIMD:
+        return float(simsimd.dot(a, b))
+    return float(np.dot(a, b))
+
+def _normalize(v: np.ndarray) -> np.ndarray:
+    """Scale an embedding to unit length so cosine similarity is a plain dot product"""
+    v = np.ascontiguousarray(v, dtype=np.float32)
+    norm = np.sqrt(np.vdot(v, v))
+    return v / norm if norm else v
+
+def _quantize(v: np.ndarray) -> memoryview:
+    """Pack an embedding as a float32 scale and symmetric int8 values in one buffer"""
+    v = np.ascontiguousarray(v, dtype=np.float32)
+    scale = np.float32(np.max(np.abs(v)) / 127.0) or np.float32(1.0)
+    packed = np.empty(4 + v.size, dtype=np.int8)
+    packed[:4].view(np.float32)[0] = scale
+    packed[4:] = np.rint(v / scale)
+    # SQLite reads the array's buffer directly, without an intermediate bytes copy
+    return sqlite3.Binary(packed)
+
+def _format_chapter_range(chapter_num: int) -> str:
+    """Format the hundred-chapter range a chapter is filed under, e.g. 0400-0499 for 456"""
+    range_base = (chapter_num // 100) * 100
+    return f"{range_base:04d}-{range_base + 99:04d}"
+
+# Florida Statutes chapters stop below 1000, so their ranges are formatted once up front
+_CHAPTER_RANGES = {n: _format_chapter_range(n) for n in range(1001)}
+
+def _chapter_range(chapter_num: int) -> str:
+    """Look up the range string for a chapter, formatting it only for out-of-table chapters"""
+    range_str = _CHAPTER_RANGES.get(chapter_num)
+    return range_str if range_str is not None else _format_chapter_range(chapter_num)
+
+@lru_cache(maxsize=STATUTE_URL_CACHE_SIZE)
+def _build_statute_url(statute_id: str) -> str:
+    """Build the statute URL; statute IDs repeat across a hearing, so results are memoized"""
+    # Clean up the statute ID
+    statute_id = statute_id.strip().replace(' ', '')
+    
+    # Check if the ID has a chapter and section
+    if '.' in statute_id:
+        parts = statute_id.split('.')
+        chapter = parts[0]
+        section = parts[1]
+        
+        # Format: http://www.leg.state.fl.us/statutes/index.cfm?App_mode=Display_Statute&Search_String=&URL=0400-0499/0456/Sections/0456.013.html
+        # Determine the chapter range (e.g., 0400-0499 for chapter 456)
+        range_str = _chapter_range(int(chapter))
+        
+        return f"{FL_STATUTES_BASE_URL}/index.cfm?App_mode=Display_Statute&Search_String=&URL={range_str}/{chapter}/Sections/{chapter}.{section}.html"
+    else:
+        # Just chapter, like "32B"
+        # Extract number part
+        chapter_match = _CHAPTER_RE.match(statute_id)
+        if chapter_match:
+            range_str = _chapter_range(int(chapter_match.group()))
+            
+            return f"{FL_STATUTES_BASE_URL}/index.cfm?App_mode=Display_Statute&Search_String=&URL={range_str}/{statute_id}/0{statute_id}.html"
+        else:
+            # Fallback to search
+            return f"{FL_STATUTES_BASE_URL}/index.cfm?App_mode=Display_Statute&Search_String={statute_id}"
+
+def _parse_statute_page(content: bytes) -> Tuple[Optional[str], str, bool]:
+    """Extract the title, text and found flag from a statute page; the title is None when the page has none"""
+    soup = BeautifulSoup(content, HTML_PARSER)
+    
+    # Extract the statute title and text
+    # Look for statute title in multiple possible locations
+    title = None
+    title_element = soup.find('span', class_='StatuteTitle')
+    if title_element:
+        title = title_element.text.strip()
+    else:
+        # Try alternative locations
+        title_element = soup.find('h1') or soup.find('h2') or soup.find('title')
+        if title_element:
+            title = title_element.text.strip()
+    
+    # Try to find the main statute text container
+    # This may vary based on the actual website structure
+    statute_text_element = soup.find('div', class_='Statute') or soup.find('div', id='content')
+    
+    if statute_text_element:
+        # Clean up the text
+        text = statute_text_element.get_text(separator="\n", strip=True)
+    else:
+        # Fallback to the main content area
+        body = soup.find('body')
+        if body:
+            text = body.get_text(separator="\n", strip=True)
+        else:
+            text = "Statute text not found."
+            
+    # Check if we found meaningful statute content
+    # If the response doesn't contain expected elements, mark it as not found
+    return title, text, bool(statute_text_element)
 
 class StatuteLookupService:
-    def __init__(self, db_path=None):
+    # The sentence embedding model is shared by every instance and loaded at most once per process
+    _model = None
+    _model_lock = threading.Lock()
+    
+    def __init__(self, db_path=None, cache_backend: Optional[MutableMapping] = None):
         """
         Initialize the Statute Lookup Service with a cache database
         
         Args:
             db_path: Path to the SQLite database file for caching. If None, uses in-memory DB.
+            cache_backend: Mapping to cache fetched statutes in instead of SQLite, such as
+                a plain dict in tests. Each entry holds (result, last_updated, embedding),
+                and no database is opened.
         """
         self.db_path = db_path or os.path.join(
             os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
             "statute_cache.db"
         )
         
-        # Initialize the database
-        self._init_database()
+        # One connection is shared by every cache query; the lock serializes
+        # its use across the request handler's worker threads
+        self._conn = self._connect() if cache_backend is None else None
+        self._lock = threading.Lock()
+        
+        # Least recently used statutes read from the cache, with their last update time
+        self._memory_cache = OrderedDict()
+        
+        # Statutes cached outside SQLite, keyed by ID like the memory cache
+        self._cache_backend = cache_backend
         
-        # Initialize the sentence transformer model
-        self.model = None
+        # Initialize the database
+        if self._conn is not None:
+            self._init_database()
+        
+        # Reuse one HTTP session so statute fetches share keep-alive connections
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
+        # Worker threads for fetching several uncached statutes at once
+        self._fetch_executor = ThreadPoolExecutor(max_workers=STATUTE_FETCH_WORKERS)
+        
+        # Worker threads that encode newly cached statutes off the fetch path,
+        # and the encodes still running, keyed by statute ID
+        self._embed_executor = ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS)
+        self._pending_embeddings: Dict[str, Future] = {}
     
     def _get_embedding_model(self):
         """Lazy-load the sentence embedding model"""
-        if self.model is None:
-            self.model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
-        return self.model
+        if StatuteLookupService._model is None:
+            with StatuteLookupService._model_lock:
+                if StatuteLookupService._model is None:
+                    StatuteLookupService._model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
+        return StatuteLookupService._model
 
     def calculate_similarity(self, text1: str, text2: str) -> float:
         """
@@ -51,20 +235,37 @@ class StatuteLookupService:
             Similarity score between 0 and 1
         """
         model = self._get_embedding_model()
-        embedding1 = model.encode(text1)
-        embedding2 = model.encode(text2)
+        embedding1, embedding2 = model.encode([text1, text2])
         
-        # Calculate cosine similarity
-        similarity = np.dot(embedding1, embedding2) / (
-            np.linalg.norm(embedding1) * np.linalg.norm(embedding2)
-        )
+        return self.calculate_similarity_precomputed(embedding1, embedding2)
+    
+    def calculate_similarity_precomputed(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
+        """
+        Calculate similarity between two texts that have already been encoded
         
-        return float(similarity)
+        Args:
+            embedding1: Embedding of the first text
+            embedding2: Embedding of the second text
+            
+        Returns:
+            Similarity score between 0 and 1
+        """
+        return _cosine_similarity(embedding1, embedding2)
 
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection to the cache database with the tuned settings applied"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
     def _init_database(self):
         """Initialize the SQLite database with the necessary tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn.cursor()
+        
+        # Write-ahead logging is stored in the database file, so it only needs setting once;
+        # it lets readers carry on while a cache write is in progress
+        cursor.execute("PRAGMA journal_mode=WAL")
         
         # Create tables if they don't exist
         cursor.execute('''
@@ -74,12 +275,17 @@ class StatuteLookupService:
             full_text TEXT,
             url TEXT,
             last_updated TIMESTAMP,
-            embedding BLOB
+            embedding BLOB,
+            embedding_format INTEGER DEFAULT 0
         )
         ''')
         
-        conn.commit()
-        conn.close()
+        # Caches created before embeddings were quantized hold float32 blobs only
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(statutes)")}
+        if "embedding_format" not in columns:
+            cursor.execute("ALTER TABLE statutes ADD COLUMN embedding_format INTEGER DEFAULT 0")
+        
+        self._conn.commit()
     
     def build_statute_url(self, statute_id: str) -> str:
         """
@@ -91,37 +297,30 @@ class StatuteLookupService:
         Returns:
             URL string for the statute
         """
-        # Clean up the statute ID
-        statute_id = statute_id.strip().replace(' ', '')
-        
-        # Check if the ID has a chapter and section
-        if '.' in statute_id:
-            parts = statute_id.split('.')
-            chapter = parts[0]
-            section = parts[1]
-            
-            # Format: http://www.leg.state.fl.us/statutes/index.cfm?App_mode=Display_Statute&Search_String=&URL=0400-0499/0456/Sections/0456.013.html
-            # Determine the chapter range (e.g., 0400-0499 for chapter 456)
-            chapter_num = int(chapter)
-            range_base = (chapter_num // 100) * 100
-            range_top = range_base + 99
-            range_str = f"{range_base:04d}-{range_top:04d}"
-            
-            return f"{FL_STATUTES_BASE_URL}/index.cfm?App_mode=Display_Statute&Search_String=&URL={range_str}/{chapter}/Sections/{chapter}.{section}.html"
-        else:
-            # Just chapter, like "32B"
-            # Extract number part
-            chapter_match = re.match(r'(\d+)', statute_id)
-            if chapter_match:
-                chapter_num = int(chapter_match.group(1))
-                range_base = (chapter_num // 100) * 100
-                range_top = range_base + 99
-                range_str = f"{range_base:04d}-{range_top:04d}"
-                
-                return f"{FL_STATUTES_BASE_URL}/index.cfm?App_mode=Display_Statute&Search_String=&URL={range_str}/{statute_id}/0{statute_id}.html"
-            else:
-                # Fallback to search
-                return f"{FL_STATUTES_BASE_URL}/index.cfm?App_mode=Display_Statute&Search_String={statute_id}"
+        return _build_statute_url(statute_id)
+    
+    def _placeholder_result(self, statute_id: str, error: Optional[str] = None) -> Dict[str, Any]:
+        """Build the result returned when a statute could not be retrieved"""
+        if error is None:
+            # If no result from website, return a placeholder
+            return {
+                "statute_id": statute_id,
+                "title": f"Statute {statute_id}",
+                "text": f"Statute text for {statute_id} could not be retrieved.",
+                "url": self.build_statute_url(statute_id),
+                "found": False,
+                "cached": False
+            }
+        # Return a placeholder with the error
+        return {
+            "statute_id": statute_id,
+            "title": f"Statute {statute_id}",
+            "text": f"Error retrieving statute: {error}",
+            "url": self.build_statute_url(statute_id),
+            "found": False,
+            "cached": False,
+            "error": error
+        }
     
     def fetch_statute(self, statute_id: str, force_refresh: bool = False) -> Dict[str, Any]:
         """
@@ -148,26 +347,51 @@ class StatuteLookupService:
                 self._update_cache(statute_id, result)
                 return result
             else:
-                # If no result from website, return a placeholder
-                return {
-                    "statute_id": statute_id,
-                    "title": f"Statute {statute_id}",
-                    "text": f"Statute text for {statute_id} could not be retrieved.",
-                    "url": self.build_statute_url(statute_id),
-                    "found": False,
-                    "cached": False
-                }
+                return self._placeholder_result(statute_id)
         except Exception as e:
-            # Return a placeholder with the error
-            return {
-                "statute_id": statute_id,
-                "title": f"Statute {statute_id}",
-                "text": f"Error retrieving statute: {str(e)}",
-                "url": self.build_statute_url(statute_id),
-                "found": False,
-                "cached": False,
-                "error": str(e)
-            }
+            return self._placeholder_result(statute_id, str(e))
+    
+    def fetch_statutes(self, statute_ids: List[str], force_refresh: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch several statutes, writing any newly fetched ones to the cache in one transaction
+        
+        Statute texts are not encoded here; embeddings are added on first comparison.
+        
+        Args:
+            statute_ids: The statute identifiers
+            force_refresh: Whether to bypass the cache and fetch from the website
+            
+        Returns:
+            Dictionary mapping each distinct statute ID to its statute information
+        """
+        results = {}
+        misses = []
+        for statute_id in dict.fromkeys(statute_ids):
+            cached_result = None if force_refresh else self._get_from_cache(statute_id)
+            results[statute_id] = cached_result
+            if not cached_result:
+                misses.append(statute_id)
+        
+        # Fetch the uncached statutes concurrently over the shared keep-alive session
+        futures = {statute_id: self._fetch_executor.submit(self._fetch_from_website, statute_id)
+                   for statute_id in misses}
+        rows = []
+        for statute_id, future in futures.items():
+            try:
+                result = future.result()
+            except Exception as e:
+                results[statute_id] = self._placeholder_result(statute_id, str(e))
+                continue
+            
+            if result:
+                rows.append(self._cache_row(statute_id, result))
+                results[statute_id] = result
+            else:
+                results[statute_id] = self._placeholder_result(statute_id)
+        
+        if rows:
+            self._update_cache_many(rows)
+        return results
     
     def _fetch_from_website(self, statute_id: str) -> Dict[str, Any]:
         """
@@ -182,43 +406,14 @@ class StatuteLookupService:
         url = self.build_statute_url(statute_id)
         
         # Fetch the webpage
-        response = requests.get(url)
+        response = self.session.get(url, timeout=REQUEST_TIMEOUT)
         if response.status_code != 200:
             raise Exception(f"Failed to fetch statute from website: HTTP {response.status_code}")
         
         # Parse the HTML
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Extract the statute title and text
-        # Look for statute title in multiple possible locations
-        title = f"Statute {statute_id}"
-        title_element = soup.find('span', class_='StatuteTitle')
-        if title_element:
-            title = title_element.text.strip()
-        else:
-            # Try alternative locations
-            title_element = soup.find('h1') or soup.find('h2') or soup.find('title')
-            if title_element:
-                title = title_element.text.strip()
-        
-        # Try to find the main statute text container
-        # This may vary based on the actual website structure
-        statute_text_element = soup.find('div', class_='Statute') or soup.find('div', id='content')
-        
-        if statute_text_element:
-            # Clean up the text
-            text = statute_text_element.get_text(separator="\n", strip=True)
-        else:
-            # Fallback to the main content area
-            body = soup.find('body')
-            if body:
-                text = body.get_text(separator="\n", strip=True)
-            else:
-                text = "Statute text not found."
-                
-        # Check if we found meaningful statute content
-        # If the response doesn't contain expected elements, mark it as not found
-        found = bool(statute_text_element)
+        title, text, found = _parse_statute_page(response.content)
+        if title is None:
+            title = f"Statute {statute_id}"
         
         return {
             "statute_id": statute_id,
@@ -239,36 +434,71 @@ class StatuteLookupService:
         Returns:
             Dictionary containing statute information, or None if not in cache
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Get the statute information
-        cursor.execute(
-            "SELECT id, title, full_text, url, last_updated FROM statutes WHERE id = ?",
-            (statute_id,)
-        )
+        if self._cache_backend is not None:
+            entry = self._cache_backend.get(statute_id)
+            if entry is None:
+                return None
+        else:
+            entry = self._get_from_database(statute_id)
+            if entry is None:
+                return None
         
-        result = cursor.fetchone()
-        conn.close()
+        # Check if the cache is expired
+        cached_result, last_updated = entry[:2]
+        if datetime.now() - last_updated > timedelta(days=CACHE_EXPIRY):
+            return None
         
-        if result:
-            # Check if the cache is expired
-            last_updated = datetime.fromisoformat(result[4])
-            if datetime.now() - last_updated > timedelta(days=CACHE_EXPIRY):
-                return None
-            
-            # Return the cached result
-            return {
-                "statute_id": result[0],
-                "title": result[1],
-                "text": result[2],
-                "url": result[3],
+        # Return a copy of the cached result so callers can't change the cached entry
+        return dict(cached_result)
+    
+    def _get_from_database(self, statute_id: str) -> Optional[Tuple[Dict[str, Any], datetime]]:
+        """Read a cached statute and its last update time, from memory or SQLite"""
+        with self._lock:
+            # Recently read statutes are kept in memory in front of SQLite
+            entry = self._memory_cache.get(statute_id)
+            if entry is not None:
+                self._memory_cache.move_to_end(statute_id)
+            else:
+                # Get the statute information
+                result = self._conn.execute(
+                    "SELECT id, title, full_text, url, last_updated FROM statutes WHERE id = ?",
+                    (statute_id,)
+                ).fetchone()
+                if not result:
+                    return None
+                
+                entry = self._cache_entry(result)
+                self._memory_cache[statute_id] = entry
+                if len(self._memory_cache) > MEMORY_CACHE_SIZE:
+                    self._memory_cache.popitem(last=False)
+        return entry
+    
+    def _cache_entry(self, row: Tuple) -> Tuple[Dict[str, Any], datetime]:
+        """Build the cached result for a (id, title, full_text, url, last_updated, ...) row"""
+        return (
+            {
+                "statute_id": row[0],
+                "title": row[1],
+                "text": row[2],
+                "url": row[3],
                 "found": True,
                 "cached": True,
-                "last_updated": result[4]
-            }
-        
-        return None
+                "last_updated": row[4]
+            },
+            datetime.fromisoformat(row[4])
+        )
+    
+    def _cache_row(self, statute_id: str, data: Dict[str, Any]) -> Tuple:
+        """Build the statutes table row for a fetched statute, leaving its embedding to be filled in later"""
+        return (
+            statute_id,
+            data.get("title", f"Statute {statute_id}"),
+            data.get("text", ""),
+            data.get("url", self.build_statute_url(statute_id)),
+            datetime.now().isoformat(),
+            None,
+            EMBEDDING_FORMAT_INT8
+        )
     
     def _update_cache(self, statute_id: str, data: Dict[str, Any]) -> None:
         """
@@ -278,33 +508,176 @@ class StatuteLookupService:
             statute_id: The statute identifier
             data: Dictionary containing statute information
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Generate embedding for the text if we have the model loaded
-        embedding_bytes = None
-        if self.model is not None and data.get("text"):
-            embedding = self._get_embedding_model().encode(data["text"])
-            embedding_bytes = embedding.tobytes()
-        
-        # Insert or update the statute information
-        cursor.execute(
-            """
-            INSERT OR REPLACE INTO statutes (id, title, full_text, url, last_updated, embedding)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (
-                statute_id,
-                data.get("title", f"Statute {statute_id}"),
-                data.get("text", ""),
-                data.get("url", self.build_statute_url(statute_id)),
-                datetime.now().isoformat(),
-                embedding_bytes
+        self._update_cache_many([self._cache_row(statute_id, data)])
+        
+        # Backfill the embedding in the background if we have the model loaded,
+        # so the caller doesn't wait on the transformer
+        if StatuteLookupService._model is not None and data.get("text"):
+            future = self._embed_executor.submit(self._encode_and_store_embedding, statute_id, data["text"])
+            with self._lock:
+                self._pending_embeddings[statute_id] = future
+            future.add_done_callback(partial(self._forget_pending_embedding, statute_id))
+    
+    def _forget_pending_embedding(self, statute_id: str, future: Future) -> None:
+        """Stop tracking a finished background encode unless a newer one replaced it"""
+        with self._lock:
+            if self._pending_embeddings.get(statute_id) is future:
+                del self._pending_embeddings[statute_id]
+    
+    def _wait_for_pending_embeddings(self, statute_ids: List[str]) -> None:
+        """Wait for background encodes of these statutes, so comparisons don't encode them again"""
+        with self._lock:
+            pending = [self._pending_embeddings[statute_id] for statute_id in statute_ids
+                       if statute_id in self._pending_embeddings]
+        if pending:
+            # A failed encode leaves no embedding, and the caller encodes the statute itself
+            wait(pending)
+    
+    def _encode_and_store_embedding(self, statute_id: str, text: str) -> None:
+        """
+        Encode a statute text and store its embedding in the cache
+        
+        Args:
+            statute_id: The statute identifier
+            text: The statute text
+        """
+        embedding = _normalize(self._get_embedding_model().encode(text))
+        self._store_embeddings([(statute_id, embedding)])
+    
+    def _get_cached_embeddings(self, statute_ids: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Read the stored embeddings of several statutes
+        
+        Args:
+            statute_ids: The statute identifiers
+            
+        Returns:
+            Unit-length embeddings keyed by statute ID, for the statutes that have one
+        """
+        if self._cache_backend is not None:
+            entries = ((statute_id, self._cache_backend.get(statute_id)) for statute_id in statute_ids)
+            return {
+                statute_id: entry[2]
+                for statute_id, entry in entries
+                if entry is not None and entry[2] is not None
+            }
+        
+        placeholders = ",".join("?" * len(statute_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, embedding, embedding_format FROM statutes "
+                f"WHERE id IN ({placeholders}) AND embedding IS NOT NULL",
+                statute_ids
+            ).fetchall()
+        return {
+            statute_id: self._load_embedding(blob, embedding_format)
+            for statute_id, blob, embedding_format in rows
+        }
+    
+    def _store_embeddings(self, embeddings: List[Tuple[str, np.ndarray]]) -> None:
+        """
+        Store unit-length statute embeddings alongside their cached statutes
+        
+        Args:
+            embeddings: Pairs of (statute ID, embedding)
+        """
+        if self._cache_backend is not None:
+            # The backend keeps the float32 embedding; only SQLite stores it quantized
+            for statute_id, embedding in embeddings:
+                entry = self._cache_backend.get(statute_id)
+                if entry is not None:
+                    self._cache_backend[statute_id] = (entry[0], entry[1], embedding)
+            return
+        
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE statutes SET embedding = ?, embedding_format = ? WHERE id = ?",
+                [
+                    (_quantize(embedding), EMBEDDING_FORMAT_INT8, statute_id)
+                    for statute_id, embedding in embeddings
+                ]
             )
-        )
+            self._conn.commit()
+    
+    def _update_cache_many(self, rows: List[Tuple]) -> None:
+        """
+        Insert or update several statutes in a single transaction
         
-        conn.commit()
-        conn.close()
+        Args:
+            rows: Tuples of (id, title, full_text, url, last_updated, embedding, embedding_format)
+        """
+        if self._cache_backend is not None:
+            for row in rows:
+                self._cache_backend[row[0]] = (*self._cache_entry(row), None)
+            return
+        
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany(
+                    """
+                    INSERT OR REPLACE INTO statutes
+                        (id, title, full_text, url, last_updated, embedding, embedding_format)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    rows
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            finally:
+                # The next read picks up the new rows from SQLite
+                for row in rows:
+                    self._memory_cache.pop(row[0], None)
+    
+    def _load_embedding(self, blob: bytes, embedding_format: Optional[int]) -> np.ndarray:
+        """
+        Decode a cached statute embedding
+        
+        Args:
+            blob: Embedding bytes from the statutes table
+            embedding_format: Layout of the bytes, from the embedding_format column
+            
+        Returns:
+            Unit-length float32 embedding
+        """
+        if embedding_format == EMBEDDING_FORMAT_INT8:
+            # The scale cancels out when normalizing, so the int8 values are used as they are;
+            # renormalizing also corrects the rounding to int8
+            return _normalize(np.frombuffer(blob, dtype=np.int8, offset=4))
+        
+        embedding = np.frombuffer(blob, dtype=np.float32)
+        if abs(np.vdot(embedding, embedding) - 1.0) > EMBEDDING_NORM_TOLERANCE:
+            # Written before embeddings were normalized on insert
+            embedding = _normalize(embedding)
+        return embedding
+    
+    def _missing_statute_result(self, transcript_text: str, statute_id: str,
+                                statute_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the comparison result for a statute that could not be retrieved"""
+        return {
+            "statute_id": statute_id,
+            "transcript_text": transcript_text,
+            "statute_text": statute_data.get("text", ""),
+            "similarity_score": 0.0,
+            "is_discrepancy": True,
+            "url": statute_data.get("url", ""),
+            "error": statute_data.get("error", "Statute not found")
+        }
+    
+    def _comparison_result(self, transcript_text: str, statute_id: str, statute_data: Dict[str, Any],
+                           similarity: float, threshold: float) -> Dict[str, Any]:
+        """Build the comparison result for a retrieved statute"""
+        return {
+            "statute_id": statute_id,
+            "transcript_text": transcript_text,
+            "statute_text": statute_data["text"],
+            "similarity_score": similarity,
+            "is_discrepancy": similarity < threshold,
+            "url": statute_data["url"],
+            "title": statute_data.get("title", f"Statute {statute_id}")
+        }
     
     def compare_transcript_to_statute(self, transcript_text: str, statute_id: str, 
                                       threshold: float = 0.6) -> Dict[str, Any]:
@@ -324,81 +697,102 @@ class StatuteLookupService:
         
         # If statute not found or has an error, return with low similarity
         if not statute_data.get("found", False) or "error" in statute_data:
-            return {
-                "statute_id": statute_id,
-                "transcript_text": transcript_text,
-                "statute_text": statute_data.get("text", ""),
-                "similarity_score": 0.0,
-                "is_discrepancy": True,
-                "url": statute_data.get("url", ""),
-                "error": statute_data.get("error", "Statute not found")
-            }
+            return self._missing_statute_result(transcript_text, statute_id, statute_data)
         
         # Calculate semantic similarity
         model = self._get_embedding_model()
-        transcript_embedding = model.encode(transcript_text)
-        
-        # Check if we already have the statute embedding in the database
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT embedding FROM statutes WHERE id = ?", (statute_id,))
-        result = cursor.fetchone()
-        conn.close()
-        
-        if result and result[0]:
-            # Use the cached embedding
-            statute_embedding = np.frombuffer(result[0], dtype=np.float32)
-        else:
+        transcript_embedding = _normalize(model.encode(transcript_text))
+        
+        # Check if we already have the statute embedding in the cache
+        self._wait_for_pending_embeddings([statute_id])
+        statute_embedding = self._get_cached_embeddings([statute_id]).get(statute_id)
+        
+        if statute_embedding is None:
             # Generate a new embedding
-            statute_embedding = model.encode(statute_data["text"])
+            statute_embedding = _normalize(model.encode(statute_data["text"]))
             
             # Update the cache with the embedding
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute(
-                "UPDATE statutes SET embedding = ? WHERE id = ?",
-                (statute_embedding.tobytes(), statute_id)
-            )
-            conn.commit()
-            conn.close()
-        
-        # Calculate cosine similarity
-        similarity = np.dot(transcript_embedding, statute_embedding) / (
-            np.linalg.norm(transcript_embedding) * np.linalg.norm(statute_embedding)
-        )
+            self._store_embeddings([(statute_id, statute_embedding)])
         
-        # Check if similarity is below threshold
-        is_discrepancy = similarity < threshold
+        # Both embeddings are unit length, so the dot product is the cosine similarity
+        similarity = _dot(transcript_embedding, statute_embedding)
         
-        return {
-            "statute_id": statute_id,
-            "transcript_text": transcript_text,
-            "statute_text": statute_data["text"],
-            "similarity_score": float(similarity),
-            "is_discrepancy": is_discrepancy,
-            "url": statute_data["url"],
-            "title": statute_data.get("title", f"Statute {statute_id}")
-        }
+        return self._comparison_result(transcript_text, statute_id, statute_data, similarity, threshold)
     
-    def batch_process_statutes(self, statutes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def batch_process_statutes(self, statutes: List[Dict[str, Any]],
+                               threshold: float = 0.6) -> List[Dict[str, Any]]:
         """
         Process multiple statute references from a transcript
         
+        All transcript snippets and any statute texts without a cached embedding
+        are encoded together in one model.encode call.
+        
         Args:
             statutes: List of statute references with statute_id and text
+            threshold: Similarity threshold for flagging discrepancies
             
         Returns:
             List of dictionaries with comparison results
         """
-        results = []
-        
-        for statute in statutes:
-            statute_id = statute.get("statute_id")
-            text = statute.get("text", "")
-            
-            if statute_id:
-                comparison = self.compare_transcript_to_statute(text, statute_id)
-                results.append(comparison)
+        references = [
+            (statute["statute_id"], statute.get("text", ""))
+            for statute in statutes
+            if statute.get("statute_id")
+        ]
+        
+        # Fetch each distinct statute once, leaving new statute texts to the batched encode below
+        statute_data = self.fetch_statutes([statute_id for statute_id, _ in references])
+        
+        found_ids = [
+            statute_id for statute_id, data in statute_data.items()
+            if data.get("found", False) and "error" not in data
+        ]
+        found = set(found_ids)
+        to_compare = [(i, ref) for i, ref in enumerate(references) if ref[0] in found]
+        
+        results = [None] * len(references)
+        for i, (statute_id, text) in enumerate(references):
+            if statute_id not in found:
+                results[i] = self._missing_statute_result(text, statute_id, statute_data[statute_id])
+        
+        if not to_compare:
+            return results
+        
+        # Look up the cached statute embeddings in one query
+        self._wait_for_pending_embeddings(found_ids)
+        statute_embeddings = self._get_cached_embeddings(found_ids)
+        missing_ids = [statute_id for statute_id in found_ids if statute_id not in statute_embeddings]
+        
+        # Encode the transcript snippets and uncached statute texts together; the
+        # model sorts the whole list by length so each mini-batch pads only to its
+        # own longest text
+        transcript_texts = [text for _, (_, text) in to_compare]
+        embeddings = self._get_embedding_model().encode(
+            transcript_texts + [statute_data[statute_id]["text"] for statute_id in missing_ids],
+            batch_size=EMBEDDING_BATCH_SIZE,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        ).astype(np.float32, copy=False)
+        transcript_embeddings = embeddings[:len(transcript_texts)]
+        new_embeddings = embeddings[len(transcript_texts):]
+        
+        if missing_ids:
+            statute_embeddings.update(zip(missing_ids, new_embeddings))
+            self._store_embeddings(list(zip(missing_ids, new_embeddings)))
+        
+        # Stack each distinct statute once and pair the rows up by index; row-wise dot
+        # products of the unit-length embeddings are the cosine similarities
+        statute_matrix = np.stack([statute_embeddings[statute_id] for statute_id in found_ids])
+        row_of = {statute_id: row for row, statute_id in enumerate(found_ids)}
+        rows = np.fromiter((row_of[statute_id] for _, (statute_id, _) in to_compare), dtype=np.intp,
+                           count=len(to_compare))
+        similarities = np.einsum("ij,ij->i", transcript_embeddings, statute_matrix[rows]).tolist()
+        
+        for (i, (statute_id, text)), similarity in zip(to_compare, similarities):
+            results[i] = self._comparison_result(
+                text, statute_id, statute_data[statute_id], similarity, threshold
+            )
         
         return results
 
@@ -0,0 +1,121 @@
+import os
+import json
+import sqlite3
+import threading
+from typing import Dict, Optional, Any
+from datetime import datetime, timedelta
+
+# Results include statute comparisons, so they expire on the same schedule as
+# the statute cache (CACHE_EXPIRY in statute_lookup)
+CACHE_EXPIRY = 30  # Cache expiry in days
+# Most transcriptions kept before the least recently used are deleted
+TRANSCRIPTION_CACHE_SIZE = int(os.getenv("TRANSCRIPTION_CACHE_SIZE", "1000"))
+
+class TranscriptionCache:
+    def __init__(self, db_path=None, max_entries: int = TRANSCRIPTION_CACHE_SIZE):
+        """
+        Initialize the transcription cache
+
+        Args:
+            db_path: Path to the SQLite database file. If None, uses transcription_cache.db in the backend directory.
+            max_entries: Most transcriptions to keep; the least recently used are deleted beyond this
+        """
+        self.db_path = db_path or os.path.join(
+            os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+            "transcription_cache.db"
+        )
+        self.max_entries = max_entries
+
+        # One connection is shared by every cache query; the lock serializes
+        # its use across the request handler's worker threads
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        # Initialize the database
+        self._init_database()
+
+    def _init_database(self):
+        """Initialize the SQLite database with the necessary tables"""
+        cursor = self._conn.cursor()
+
+        # Create tables if they don't exist
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transcriptions (
+            file_id TEXT,
+            model_name TEXT,
+            result TEXT,
+            last_updated TIMESTAMP,
+            PRIMARY KEY (file_id, model_name)
+        )
+        ''')
+
+        # Eviction reads the entries in order of last use
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transcriptions_last_updated ON transcriptions (last_updated)"
+        )
+
+        self._conn.commit()
+
+    def get(self, file_id: str, model_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a cached transcription result and mark it as recently used
+
+        Args:
+            file_id: The uploaded file identifier
+            model_name: The Whisper model and decoding settings that produced the result
+
+        Returns:
+            The cached transcription response as a dictionary, or None if not cached or expired
+        """
+        now = datetime.now()
+        with self._lock:
+            result = self._conn.execute(
+                "SELECT result FROM transcriptions WHERE file_id = ? AND model_name = ? AND last_updated >= ?",
+                (file_id, model_name, (now - timedelta(days=CACHE_EXPIRY)).isoformat())
+            ).fetchone()
+            if not result:
+                return None
+
+            self._conn.execute(
+                "UPDATE transcriptions SET last_updated = ? WHERE file_id = ? AND model_name = ?",
+                (now.isoformat(), file_id, model_name)
+            )
+            self._conn.commit()
+
+        return json.loads(result[0])
+
+    def set(self, file_id: str, model_name: str, data: Dict[str, Any]) -> None:
+        """
+        Store a transcription result in the cache, deleting expired and least recently used entries
+
+        Args:
+            file_id: The uploaded file identifier
+            model_name: The Whisper model and decoding settings that produced the result
+            data: The transcription response as a dictionary
+        """
+        now = datetime.now()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    """
+                    INSERT OR REPLACE INTO transcriptions (file_id, model_name, result, last_updated)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    (file_id, model_name, json.dumps(data), now.isoformat())
+                )
+                self._conn.execute(
+                    "DELETE FROM transcriptions WHERE last_updated < ?",
+                    ((now - timedelta(days=CACHE_EXPIRY)).isoformat(),)
+                )
+                self._conn.execute(
+                    """
+                    DELETE FROM transcriptions WHERE rowid IN (
+                        SELECT rowid FROM transcriptions ORDER BY last_updated DESC LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (self.max_entries,)
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
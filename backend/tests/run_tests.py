@@ -12,9 +12,10 @@ def run_tests():
     # Get the test directory
     test_dir = Path(__file__).parent
     
-    # Discover and run the tests
+    # Discover and run the tests, importing them from the backend directory
+    # so the app package resolves without touching sys.path in each test file
     loader = unittest.TestLoader()
-    suite = loader.discover(start_dir=str(test_dir), pattern="test_*.py")
+    suite = loader.discover(start_dir=str(test_dir), pattern="test_*.py", top_level_dir=str(test_dir.parent))
     
     # Run the tests with a text test runner
     runner = unittest.TextTestRunner(verbosity=2)
@@ -74,11 +74,11 @@ def generate_sample_audio_file(output_path, duration_seconds=5):
         
         # Generate a simple sine wave
         sample_rate = 44100
-        t = np.linspace(0, duration_seconds, duration_seconds * sample_rate, False)
-        tone = np.sin(2 * np.pi * 440 * t)  # 440 Hz tone
+        t = np.linspace(0, duration_seconds, duration_seconds * sample_rate, False, dtype=np.float32)
+        tone = np.sin(np.float32(2 * np.pi * 440) * t)  # 440 Hz tone
         
-        # Normalize and convert to 16-bit PCM
-        tone = tone * 32767 / np.max(np.abs(tone))
+        # A sine is already bounded by 1, so scale straight to 16-bit PCM
+        tone *= np.float32(32767)
         tone = tone.astype(np.int16)
         
         # Save the WAV file
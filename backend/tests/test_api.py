@@ -1,57 +1,125 @@
 """
 Tests for the FastAPI application endpoints
 """
+import io
 import unittest
-import sys
 import os
 import json
+import wave
 import tempfile
-from pathlib import Path
-from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from types import SimpleNamespace
+from httpx import ASGITransport, AsyncClient
+from unittest.mock import patch, MagicMock, AsyncMock
 
-# Add parent directory to path to import our modules
-sys.path.insert(0, str(Path(__file__).parent.parent))
+import numpy as np
 
-from app.main import app
+from app.main import app, decoded_audio_path, store_upload
+from app.services.transcription_cache import TranscriptionCache
+from app.services.report_generator import HAS_REPORTLAB
 
-class TestAPI(unittest.TestCase):
+# Dummy audio data uploaded from memory
+_DUMMY_AUDIO = b"test audio data"
+
+# Canned service results shared by the tests; each test takes its own copy
+_TRANSCRIPTION_TEXT = "This is a test transcription mentioning Section 123.45 of Florida Statutes."
+
+_EXTRACTED_STATUTES = (
+    [{"statute_id": "123.45", "start_idx": 41, "end_idx": 53, "text": "Section 123.45", "match_type": "regex"}],
+    "This is a test transcription mentioning <span class=\"statute-reference\" data-statute-id=\"123.45\">Section 123.45</span> of Florida Statutes."
+)
+
+_STATUTE_URL = "http://www.leg.state.fl.us/statutes/index.cfm?App_mode=Display_Statute&Search_String=&URL=0100-0199/0123/Sections/0123.45.html"
+
+_STATUTE_COMPARISON = {
+    "statute_id": "123.45",
+    "transcript_text": "Section 123.45",
+    "statute_text": "This is the official text of statute 123.45",
+    "similarity_score": 0.85,
+    "is_discrepancy": False,
+    "url": _STATUTE_URL,
+    "title": "Some Legal Requirement"
+}
+
+_FETCHED_STATUTE = {
+    "statute_id": "123.45",
+    "text": "This is the official text of statute 123.45",
+    "url": _STATUTE_URL,
+    "title": "Some Legal Requirement",
+    "cached": True,
+    "last_updated": "2025-04-27T12:00:00"
+}
+
+# Report requests are serialized once and posted as raw JSON bodies
+_REPORT_REQUEST = {
+    "transcriptions": [
+        {
+            "file_id": "test_file_id",
+            "hearing_date": "2025-04-27",
+            "transcription": "Test transcription",
+            "highlighted_transcription": "Test <span>transcription</span>",
+            "statutes": [],
+            "statute_comparisons": []
+        }
+    ],
+    "metadata": {"test": "data"}
+}
+_JSON_REPORT_BODY = json.dumps({**_REPORT_REQUEST, "format": "json"}).encode()
+_PDF_REPORT_BODY = json.dumps({**_REPORT_REQUEST, "format": "pdf"}).encode()
+_JSON_HEADERS = {"content-type": "application/json"}
+
+def _mock_whisper_model(text):
+    """Build a mock Whisper model whose transcription is a single segment of text"""
+    # Only the segment text is read, so a plain namespace stands in for the segment
+    mock_model = MagicMock()
+    mock_model.transcribe.return_value = ([SimpleNamespace(text=text)], SimpleNamespace())
+    return mock_model
+
+class TestAPI(unittest.IsolatedAsyncioTestCase):
     """Test cases for the FastAPI application endpoints"""
     
     def setUp(self):
-        """Set up test client and mocks"""
-        self.client = TestClient(app)
-        
-        # Create a temporary directory for test files
+        """Set up mocks"""
+        # Create a temporary directory for uploads and the cache database
         self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
         
-        # Create a test audio file
-        self.test_audio_path = os.path.join(self.temp_dir.name, "test_audio.mp3")
-        with open(self.test_audio_path, "wb") as f:
-            f.write(b"test audio data")  # Dummy audio data
+        # Keep cached transcriptions out of the real cache database
+        cache_patcher = patch(
+            "app.main.transcription_cache",
+            TranscriptionCache(db_path=os.path.join(self.temp_dir.name, "test_transcriptions.db"))
+        )
+        cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
     
-    def tearDown(self):
-        """Clean up after tests"""
-        self.temp_dir.cleanup()
+    async def asyncSetUp(self):
+        """Create a client that calls the app directly on the test's event loop"""
+        # ASGITransport calls the app without running its lifespan, so the real
+        # Whisper model is never loaded; tests install a mock with set_whisper_model
+        self.client = AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        self.addAsyncCleanup(self.client.aclose)
     
-    def test_root_endpoint(self):
+    def set_whisper_model(self, mock_model):
+        """Install a mock in place of the model loaded during app startup"""
+        model_patcher = patch.object(app.state, "whisper_model", mock_model, create=True)
+        model_patcher.start()
+        self.addCleanup(model_patcher.stop)
+    
+    async def test_root_endpoint(self):
         """Test the root endpoint"""
-        response = self.client.get("/")
+        response = await self.client.get("/")
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json(), {"message": "Welcome to CourtCaseVibe API"})
     
-    @patch("app.main.get_whisper_model")
-    @patch("app.main.os.makedirs")
-    @patch("app.main.shutil.copyfileobj")
-    def test_upload_endpoint(self, mock_copy, mock_makedirs, mock_get_model):
+    @patch.dict("app.main.file_index", clear=True)
+    async def test_upload_endpoint(self):
         """Test the audio upload endpoint"""
         # Prepare test data
-        with open(self.test_audio_path, "rb") as f:
-            files = {"file": ("test_audio.mp3", f, "audio/mpeg")}
+        with patch("app.main.UPLOAD_DIR", self.temp_dir.name):
+            files = {"file": ("test_audio.mp3", io.BytesIO(_DUMMY_AUDIO), "audio/mpeg")}
             data = {"hearing_date": "2025-04-27"}
             
             # Make the request
-            response = self.client.post("/upload/", files=files, data=data)
+            response = await self.client.post("/upload/", files=files, data=data)
         
         # Check response
         self.assertEqual(response.status_code, 201)
@@ -59,44 +127,101 @@ class TestAPI(unittest.TestCase):
         self.assertIn("file_id", json_data)
         self.assertEqual(json_data["hearing_date"], "2025-04-27")
         self.assertEqual(json_data["filename"], "test_audio.mp3")
+        
+        # The upload should be streamed to disk unchanged
+        with open(json_data["stored_path"], "rb") as f:
+            self.assertEqual(f.read(), _DUMMY_AUDIO)
     
-    @patch("app.main.get_whisper_model")
-    @patch("app.main.os.listdir")
-    def test_transcribe_endpoint(self, mock_listdir, mock_get_model):
+    @patch.dict("app.main.file_index", clear=True)
+    async def test_upload_rejects_non_audio(self):
+        """Test that uploads are filtered by file extension"""
+        with patch("app.main.UPLOAD_DIR", self.temp_dir.name):
+            response = await self.client.post(
+                "/upload/",
+                files={"file": ("notes.txt", io.BytesIO(_DUMMY_AUDIO), "text/plain")},
+                data={"hearing_date": "2025-04-27"}
+            )
+        self.assertEqual(response.status_code, 400)
+        
+        # Extensions are matched case-insensitively and stored lowercased
+        with patch("app.main.UPLOAD_DIR", self.temp_dir.name):
+            response = await self.client.post(
+                "/upload/",
+                files={"file": ("HEARING.MP3", io.BytesIO(_DUMMY_AUDIO), "audio/mpeg")},
+                data={"hearing_date": "2025-04-27"}
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.json()["stored_path"].endswith(".mp3"))
+    
+    @patch.dict("app.main.file_index", clear=True)
+    async def test_upload_decodes_audio(self):
+        """Test that uploads are decoded once to a 16kHz waveform"""
+        # Write one second of silence at 44.1kHz
+        wav_path = os.path.join(self.temp_dir.name, "silence.wav")
+        with wave.open(wav_path, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(44100)
+            wav.writeframes(b"\x00\x00" * 44100)
+        
+        with open(wav_path, "rb") as f, patch("app.main.UPLOAD_DIR", self.temp_dir.name):
+            files = {"file": ("silence.wav", f, "audio/wav")}
+            response = await self.client.post("/upload/", files=files, data={"hearing_date": "2025-04-27"})
+            self.assertEqual(response.status_code, 201)
+            decoded_path = decoded_audio_path(response.json()["file_id"])
+        
+        # The stored waveform should be resampled to what Whisper expects
+        audio = np.load(decoded_path)
+        self.assertEqual(audio.dtype, np.float32)
+        self.assertAlmostEqual(len(audio), 16000, delta=160)
+    
+    def test_store_upload_removes_partial_copy(self):
+        """Test that a failed upload copy doesn't leave its temporary file behind"""
+        source = MagicMock()
+        source.read.side_effect = [b"partial audio", OSError("client disconnected")]
+        temp_path = os.path.join(self.temp_dir.name, ".upload-test.part")
+        
+        with self.assertRaises(OSError):
+            store_upload(source, temp_path)
+        self.assertFalse(os.path.exists(temp_path))
+    
+    @patch.dict("app.main.file_index", clear=True)
+    async def test_upload_duplicate_audio(self):
+        """Test that re-uploading identical audio reuses the stored file"""
+        file_ids = []
+        with patch("app.main.UPLOAD_DIR", self.temp_dir.name):
+            for filename in ("first.mp3", "second.mp3"):
+                files = {"file": (filename, io.BytesIO(_DUMMY_AUDIO), "audio/mpeg")}
+                response = await self.client.post("/upload/", files=files, data={"hearing_date": "2025-04-27"})
+                self.assertEqual(response.status_code, 201)
+                file_ids.append(response.json()["file_id"])
+        
+        # Both uploads should resolve to a single stored copy
+        self.assertEqual(file_ids[0], file_ids[1])
+        stored = [f for f in os.listdir(self.temp_dir.name) if f.startswith(file_ids[0])]
+        self.assertEqual(stored, [f"{file_ids[0]}.mp3"])
+    
+    @patch.dict("app.main.file_index", {"0123456789abcdef": "0123456789abcdef.mp3"}, clear=True)
+    async def test_transcribe_endpoint(self):
         """Test the transcribe endpoint"""
         # Mock the Whisper model
-        mock_model = MagicMock()
-        mock_model.transcribe.return_value = {"text": "This is a test transcription mentioning Section 123.45 of Florida Statutes."}
-        mock_get_model.return_value = mock_model
-        
-        # Mock file listing
-        mock_listdir.return_value = ["test_file_id.mp3"]
-        
-        # Mock statute extraction to avoid dependence on SpaCy
-        with patch("app.main.statute_extractor.get_highlighted_json") as mock_extract:
-            # Return some dummy statutes and highlighted text
-            mock_extract.return_value = (
-                [{"statute_id": "123.45", "start_idx": 41, "end_idx": 53, "text": "Section 123.45", "match_type": "regex"}],
-                "This is a test transcription mentioning <span class=\"statute-reference\" data-statute-id=\"123.45\">Section 123.45</span> of Florida Statutes."
+        self.set_whisper_model(_mock_whisper_model(_TRANSCRIPTION_TEXT))
+        
+        # Mock statute extraction to avoid dependence on SpaCy and statute lookup
+        # to avoid web requests, swapping both services in one patch
+        statutes, highlighted = _EXTRACTED_STATUTES
+        with patch.multiple(
+            "app.main",
+            statute_extractor=MagicMock(**{
+                "get_highlighted_json.return_value": ([dict(statute) for statute in statutes], highlighted)
+            }),
+            statute_lookup=MagicMock(**{"batch_process_statutes.return_value": [dict(_STATUTE_COMPARISON)]}),
+        ):
+            # Make the request
+            response = await self.client.post(
+                "/transcribe/",
+                json={"hearing_date": "2025-04-27", "file_ids": ["0123456789abcdef"]}
             )
-            
-            # Mock statute lookup to avoid web requests
-            with patch("app.main.statute_lookup.batch_process_statutes") as mock_lookup:
-                mock_lookup.return_value = [{
-                    "statute_id": "123.45",
-                    "transcript_text": "Section 123.45",
-                    "statute_text": "This is the official text of statute 123.45",
-                    "similarity_score": 0.85,
-                    "is_discrepancy": False,
-                    "url": "http://www.leg.state.fl.us/statutes/index.cfm?App_mode=Display_Statute&Search_String=&URL=0100-0199/0123/Sections/0123.45.html",
-                    "title": "Some Legal Requirement"
-                }]
-                
-                # Make the request
-                response = self.client.post(
-                    "/transcribe/",
-                    json={"hearing_date": "2025-04-27", "file_ids": ["test_file_id"]}
-                )
         
         # Check response
         self.assertEqual(response.status_code, 200)
@@ -106,27 +231,63 @@ class TestAPI(unittest.TestCase):
         self.assertIn("highlighted_transcription", json_data[0])
         self.assertIn("statutes", json_data[0])
         self.assertIn("statute_comparisons", json_data[0])
+        self.assertEqual(json_data[0]["transcription"], _TRANSCRIPTION_TEXT)
         
         # Verify extracted statute
         statutes = json_data[0]["statutes"]
         self.assertEqual(len(statutes), 1)
         self.assertEqual(statutes[0]["statute_id"], "123.45")
     
+    @patch("app.main.glob.glob")
+    async def test_transcribe_rejects_invalid_file_id(self, mock_glob):
+        """Test that file IDs that aren't upload hashes are not found without touching the filesystem"""
+        for file_id in ("../../../../tmp/secret", "..", "0123456789ABCDEF", "0123456789abcdef0"):
+            with self.subTest(file_id=file_id):
+                response = await self.client.post(
+                    "/transcribe/",
+                    json={"hearing_date": "2025-04-27", "file_ids": [file_id]}
+                )
+                self.assertEqual(response.status_code, 404)
+        mock_glob.assert_not_called()
+    
+    @patch.dict("app.main.file_index", {"fedcba9876543210": "fedcba9876543210.mp3"}, clear=True)
+    async def test_transcribe_endpoint_cached(self):
+        """Test that repeat transcriptions are served from the cache"""
+        mock_model = _mock_whisper_model("No statutes are mentioned here.")
+        self.set_whisper_model(mock_model)
+        
+        # Transcribe the same file twice, then once more with force_refresh
+        responses = [
+            await self.client.post("/transcribe/", json={"hearing_date": "2025-04-27", "file_ids": ["fedcba9876543210"]}),
+            await self.client.post("/transcribe/", json={"hearing_date": "2025-04-28", "file_ids": ["fedcba9876543210"]}),
+        ]
+        self.assertEqual(mock_model.transcribe.call_count, 1, "Second request should not re-run Whisper")
+        
+        await self.client.post(
+            "/transcribe/",
+            json={"hearing_date": "2025-04-28", "file_ids": ["fedcba9876543210"], "force_refresh": True}
+        )
+        self.assertEqual(mock_model.transcribe.call_count, 2, "force_refresh should bypass the cache")
+        
+        # Results cached under other Whisper settings aren't reused
+        with patch("app.main.TRANSCRIPTION_CACHE_KEY", "small/float32/batch_size=16/beam_size=1/vad_filter=True"):
+            await self.client.post("/transcribe/", json={"hearing_date": "2025-04-28", "file_ids": ["fedcba9876543210"]})
+        self.assertEqual(mock_model.transcribe.call_count, 3, "Changed settings should miss the cache")
+        
+        # Cached results should carry the hearing date of the current request
+        for response in responses:
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(responses[1].json()[0]["transcription"], "No statutes are mentioned here.")
+        self.assertEqual(responses[1].json()[0]["hearing_date"], "2025-04-28")
+    
     @patch("app.main.statute_lookup.fetch_statute")
-    def test_statute_endpoint(self, mock_fetch):
+    async def test_statute_endpoint(self, mock_fetch):
         """Test the statute lookup endpoint"""
         # Mock the statute lookup
-        mock_fetch.return_value = {
-            "statute_id": "123.45",
-            "text": "This is the official text of statute 123.45",
-            "url": "http://www.leg.state.fl.us/statutes/index.cfm?App_mode=Display_Statute&Search_String=&URL=0100-0199/0123/Sections/0123.45.html",
-            "title": "Some Legal Requirement",
-            "cached": True,
-            "last_updated": "2025-04-27T12:00:00"
-        }
+        mock_fetch.return_value = dict(_FETCHED_STATUTE)
         
         # Make the request
-        response = self.client.get("/statute/123.45")
+        response = await self.client.get("/statute/123.45")
         
         # Check response
         self.assertEqual(response.status_code, 200)
@@ -135,29 +296,17 @@ class TestAPI(unittest.TestCase):
         self.assertEqual(json_data["title"], "Some Legal Requirement")
         self.assertTrue(json_data["cached"])
     
-    @patch("app.main.report_generator.generate_json_report")
-    def test_generate_json_report(self, mock_generate):
+    @patch("app.main.report_generator.generate_json_report_async", new_callable=AsyncMock)
+    async def test_generate_json_report(self, mock_generate):
         """Test the report generation endpoint for JSON reports"""
         # Mock the report generation
         mock_generate.return_value = "/tmp/report_12345.json"
         
         # Make the request
-        response = self.client.post(
+        response = await self.client.post(
             "/generate-report",
-            json={
-                "format": "json",
-                "transcriptions": [
-                    {
-                        "file_id": "test_file_id",
-                        "hearing_date": "2025-04-27",
-                        "transcription": "Test transcription",
-                        "highlighted_transcription": "Test <span>transcription</span>",
-                        "statutes": [],
-                        "statute_comparisons": []
-                    }
-                ],
-                "metadata": {"test": "data"}
-            }
+            content=_JSON_REPORT_BODY,
+            headers=_JSON_HEADERS
         )
         
         # Check response
@@ -167,29 +316,17 @@ class TestAPI(unittest.TestCase):
         self.assertIn("download_link", json_data)
         self.assertIn("/download-report/", json_data["download_link"])
     
-    @patch("app.main.report_generator.generate_pdf_report")
-    def test_generate_pdf_report(self, mock_generate):
+    @patch("app.main.report_generator.generate_pdf_report_async", new_callable=AsyncMock)
+    async def test_generate_pdf_report(self, mock_generate):
         """Test the report generation endpoint for PDF reports"""
         # Mock the report generation
         mock_generate.return_value = "/tmp/report_12345.pdf"
         
         # Make the request
-        response = self.client.post(
+        response = await self.client.post(
             "/generate-report",
-            json={
-                "format": "pdf",
-                "transcriptions": [
-                    {
-                        "file_id": "test_file_id",
-                        "hearing_date": "2025-04-27",
-                        "transcription": "Test transcription",
-                        "highlighted_transcription": "Test <span>transcription</span>",
-                        "statutes": [],
-                        "statute_comparisons": []
-                    }
-                ],
-                "metadata": {"test": "data"}
-            }
+            content=_PDF_REPORT_BODY,
+            headers=_JSON_HEADERS
         )
         
         # Check response
@@ -197,6 +334,51 @@ class TestAPI(unittest.TestCase):
         json_data = response.json()
         self.assertEqual(json_data["format"], "pdf")
         self.assertIn("download_link", json_data)
+    
+    async def test_export_json_report(self):
+        """Test that reports can be returned directly without a download link"""
+        response = await self.client.post(
+            "/export-report",
+            content=_JSON_REPORT_BODY,
+            headers=_JSON_HEADERS
+        )
+        
+        # Check response
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/json")
+        self.assertIn("attachment; filename=", response.headers["content-disposition"])
+        report = response.json()
+        self.assertEqual(report["metadata"], {"test": "data"})
+        self.assertEqual(report["hearings"]["2025-04-27"][0]["file_id"], "test_file_id")
+
+    async def test_export_json_report_missing_hearing_date(self):
+        """Test that a missing hearing date is written as the key json.dumps would use"""
+        transcription = {**_REPORT_REQUEST["transcriptions"][0], "hearing_date": None}
+        response = await self.client.post(
+            "/export-report",
+            json={"format": "json", "transcriptions": [transcription]}
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.json()["hearings"]), ["null"])
+    
+    @unittest.skipUnless(HAS_REPORTLAB, "ReportLab is not installed")
+    async def test_export_pdf_report_escapes_markup(self):
+        """Test that request values containing ReportLab markup characters don't break PDF rendering"""
+        transcription = {
+            **_REPORT_REQUEST["transcriptions"][0],
+            "file_id": "<b>file & id",
+            "hearing_date": "<b>2025-04-27",
+            "statute_comparisons": [{**_STATUTE_COMPARISON, "statute_id": "<i>123.45"}]
+        }
+        response = await self.client.post(
+            "/export-report",
+            json={"format": "pdf", "transcriptions": [transcription]}
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/pdf")
+        self.assertTrue(response.content.startswith(b"%PDF"))
 
 if __name__ == '__main__':
     unittest.main()
@@ -2,35 +2,81 @@
 Tests for the statute lookup service
 """
 import unittest
-import sys
 import os
-import tempfile
 import json
-from pathlib import Path
+import re
+import threading
+from concurrent.futures import wait
 from unittest.mock import patch, MagicMock
 
-# Add parent directory to path to import our modules
-sys.path.insert(0, str(Path(__file__).parent.parent))
+import numpy as np
+import responses
 
+from app.services import statute_lookup
 from app.services.statute_lookup import StatuteLookupService
 
+# Statute pages served by the mocked website, encoded once for the whole module
+_SIMPLE_STATUTE_HTML = b"<html><body><div class='Statute'>Test statute text</div></body></html>"
+
+_DUI_STATUTE_HTML = b"""<html>
+    <body>
+        <h1>Title XLVI</h1>
+        <h2>Chapter 316</h2>
+        <div class='Statute'>
+            <span class='StatuteNum'>316.193</span>
+            <span class='StatuteTitle'>Driving under the influence</span>
+            <div class='StatuteText'>
+                <p>(1) A person is guilty of the offense of driving under the influence if:</p>
+                <p>(a) The person is driving or in actual physical control of a vehicle; and</p>
+                <p>(b) The person has a blood-alcohol level of 0.08 or more.</p>
+            </div>
+        </div>
+    </body>
+</html>"""
+
+_INVALID_STATUTE_HTML = b"<html><body>Invalid statute page</body></html>"
+
+# Every statute page on the Florida statutes website
+_STATUTE_PAGE_URL = re.compile(r"http://www\.leg\.state\.fl\.us/statutes/index\.cfm\?.*")
+
+def _statute_section_url(statute_id):
+    """Match the page of a single statute section"""
+    return re.compile(r"http://www\.leg\.state\.fl\.us/statutes/.*/" + re.escape(statute_id) + r"\.html$")
+
+# Statutes returned by the mocked fetch in the batch tests
+_STATUTE_DATA = {
+    "123.45": {"statute_id": "123.45", "title": "Statute 123.45", "text": "Statute text 123.45",
+               "url": "http://example.com/123.45", "found": True},
+    "456.78": {"statute_id": "456.78", "title": "Statute 456.78", "text": "Statute text 456.78",
+               "url": "http://example.com/456.78", "found": True},
+    "999.99": {"statute_id": "999.99", "text": "Not found", "url": "http://example.com/999.99",
+               "found": False}
+}
+
+# Statute mentions passed to batch processing, copied into a list per call
+_STATUTES_FIXTURE = (
+    {"statute_id": "123.45", "text": "Section 123.45 says something"},
+    {"statute_id": "456.78", "text": "Chapter 456.78 requires compliance"},
+    {"statute_id": "123.45", "text": "Section 123.45 again"},
+    {"statute_id": "999.99", "text": "Section 999.99 is made up"}
+)
+
+_UNIT_VECTOR = np.array([0.6, 0.8], dtype=np.float32)
+
+def _encode_unit_vectors(texts, **kwargs):
+    """Encode every text to the same unit vector, so each similarity is 1"""
+    return np.tile(_UNIT_VECTOR, (len(texts), 1))
+
 class TestStatuteLookupService(unittest.TestCase):
     """Test cases for the StatuteLookupService class"""
     
     def setUp(self):
-        """Set up test cases with a temporary database"""
-        # Create a temporary directory for the test database
-        self.temp_dir = tempfile.TemporaryDirectory()
-        
-        # Initialize the lookup service with the test database
-        self.lookup_service = StatuteLookupService(db_path=os.path.join(self.temp_dir.name, 'test_statutes.db'))
+        """Set up test cases with an empty in-memory database"""
+        # The service keeps a single connection open, so an in-memory database
+        # lasts for the whole test without touching the filesystem
+        self.lookup_service = StatuteLookupService(db_path=":memory:")
     
-    def tearDown(self):
-        """Clean up after tests"""
-        self.temp_dir.cleanup()
-    
-    @patch('app.services.statute_lookup.requests.get')
-    def test_build_statute_url(self, mock_get):
+    def test_build_statute_url(self):
         """Test URL building for Florida statutes"""
         # Test with simple statute ID
         url = self.lookup_service.build_statute_url("123.45")
@@ -41,59 +87,86 @@ class TestStatuteLookupService(unittest.TestCase):
         url = self.lookup_service.build_statute_url("123")
         self.assertIn("123", url, "URL should contain the chapter number")
     
-    @patch('app.services.statute_lookup.requests.get')
-    def test_fetch_statute_with_cache(self, mock_get):
+    @responses.activate
+    def test_fetch_statute_with_cache(self):
         """Test fetching a statute with caching"""
+        # Cache statutes in a plain dict instead of SQLite
+        cache = {}
+        self.lookup_service = StatuteLookupService(db_path=":memory:", cache_backend=cache)
+        
         # Mock the response from the website
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.content = "<html><body><div class='Statute'>Test statute text</div></body></html>".encode('utf-8')
-        mock_get.return_value = mock_response
+        responses.add(responses.GET, _STATUTE_PAGE_URL, body=_SIMPLE_STATUTE_HTML, status=200)
         
         # First call should hit the website
         result1 = self.lookup_service.fetch_statute("123.45")
-        self.assertEqual(mock_get.call_count, 1, "Should make one request to the website")
+        self.assertEqual(len(responses.calls), 1, "Should make one request to the website")
+        self.assertIn("123.45", cache, "Should cache the statute in the backend")
         
-        # Reset the mock to verify the second call
-        mock_get.reset_mock()
+        # Reset the recorded calls to verify the second call
+        responses.calls.reset()
         
         # Second call should use the cache
         result2 = self.lookup_service.fetch_statute("123.45")
-        self.assertEqual(mock_get.call_count, 0, "Should not make another request")
+        self.assertEqual(len(responses.calls), 0, "Should not make another request")
         
         # Should return the same data
         self.assertEqual(result1["statute_id"], result2["statute_id"], "Cached result should have same statute ID")
         self.assertEqual(result1["text"], result2["text"], "Cached result should have same text")
         
         # Force refresh should bypass cache
-        mock_get.reset_mock()
+        responses.calls.reset()
         result3 = self.lookup_service.fetch_statute("123.45", force_refresh=True)
-        self.assertEqual(mock_get.call_count, 1, "Should make a request when force_refresh is True")
+        self.assertEqual(len(responses.calls), 1, "Should make a request when force_refresh is True")
+    
+    @responses.activate
+    def test_fetch_statutes(self):
+        """Test fetching several statutes and caching them together"""
+        responses.add(responses.GET, _STATUTE_PAGE_URL, body=_SIMPLE_STATUTE_HTML, status=200)
+        
+        with patch.object(self.lookup_service, '_update_cache_many',
+                          wraps=self.lookup_service._update_cache_many) as mock_update:
+            results = self.lookup_service.fetch_statutes(["123.45", "456.78", "123.45"])
+        
+        self.assertEqual(list(results), ["123.45", "456.78"], "Should return each distinct statute once")
+        self.assertEqual(len(responses.calls), 2, "Should request each distinct statute once")
+        self.assertEqual(mock_update.call_count, 1, "Should write the new statutes in one batch")
+        
+        # Both statutes are now served from the cache
+        responses.calls.reset()
+        results = self.lookup_service.fetch_statutes(["123.45", "456.78"])
+        self.assertEqual(len(responses.calls), 0, "Should not make another request")
+        self.assertTrue(all(result["cached"] for result in results.values()))
     
-    @patch('app.services.statute_lookup.requests.get')
-    def test_extract_statute_text(self, mock_get):
+    @responses.activate
+    def test_fetch_statute_memory_cache(self):
+        """Test that repeat cache reads are served from memory until the statute is rewritten"""
+        responses.add(responses.GET, _STATUTE_PAGE_URL, body=_SIMPLE_STATUTE_HTML, status=200)
+        
+        self.lookup_service.fetch_statute("123.45")
+        self.lookup_service.fetch_statute("123.45")
+        
+        # The second read filled the memory cache, so SQLite isn't queried again
+        conn = self.lookup_service._conn
+        self.lookup_service._conn = MagicMock(wraps=conn)
+        result = self.lookup_service.fetch_statute("123.45")
+        self.assertTrue(result["cached"], "Should return the cached statute")
+        self.lookup_service._conn.execute.assert_not_called()
+        
+        # Mutating the returned result doesn't change the cached entry
+        result["text"] = "changed"
+        self.assertEqual(self.lookup_service.fetch_statute("123.45")["text"], "Test statute text")
+        
+        # Writing the statute again drops it from memory
+        self.lookup_service.fetch_statute("123.45", force_refresh=True)
+        self.assertNotIn("123.45", self.lookup_service._memory_cache)
+        self.lookup_service._conn = conn
+    
+    @responses.activate
+    def test_extract_statute_text(self):
         """Test extracting statute text from HTML"""
-        # Mock the response with a valid statute
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.content = """
-        <html>
-            <body>
-                <h1>Title XLVI</h1>
-                <h2>Chapter 316</h2>
-                <div class='Statute'>
-                    <span class='StatuteNum'>316.193</span>
-                    <span class='StatuteTitle'>Driving under the influence</span>
-                    <div class='StatuteText'>
-                        <p>(1) A person is guilty of the offense of driving under the influence if:</p>
-                        <p>(a) The person is driving or in actual physical control of a vehicle; and</p>
-                        <p>(b) The person has a blood-alcohol level of 0.08 or more.</p>
-                    </div>
-                </div>
-            </body>
-        </html>
-        """.encode('utf-8')
-        mock_get.return_value = mock_response
+        # Serve a valid statute and a malformed page
+        responses.add(responses.GET, _statute_section_url("316.193"), body=_DUI_STATUTE_HTML, status=200)
+        responses.add(responses.GET, _statute_section_url("999.999"), body=_INVALID_STATUTE_HTML, status=200)
         
         # Fetch the statute
         result = self.lookup_service.fetch_statute("316.193")
@@ -104,7 +177,6 @@ class TestStatuteLookupService(unittest.TestCase):
         self.assertIn("person is guilty", result["text"], "Should extract the statute text")
         
         # Test with a malformed response
-        mock_response.content = "<html><body>Invalid statute page</body></html>".encode('utf-8')
         result = self.lookup_service.fetch_statute("999.999")
         self.assertFalse(result.get("found", True), "Should indicate statute not found")
     
@@ -114,45 +186,158 @@ class TestStatuteLookupService(unittest.TestCase):
         transcript_text = "If you drive under the influence, you're guilty of DUI."
         statute_text = "A person is guilty of the offense of driving under the influence."
         
-        similarity = self.lookup_service.calculate_similarity(transcript_text, statute_text)
+        different_text = "This text has nothing to do with driving or alcohol."
+        
+        # Encode each text once and reuse the statute embedding for both comparisons
+        model = self.lookup_service._get_embedding_model()
+        transcript_vec, different_vec, statute_vec = model.encode([transcript_text, different_text, statute_text])
+        
+        similarity = self.lookup_service.calculate_similarity_precomputed(transcript_vec, statute_vec)
         
         # Similarity should be relatively high for similar content
         self.assertGreater(similarity, 0.5, "Similar texts should have high similarity score")
         
         # Test with completely different texts
-        different_text = "This text has nothing to do with driving or alcohol."
-        diff_similarity = self.lookup_service.calculate_similarity(different_text, statute_text)
+        diff_similarity = self.lookup_service.calculate_similarity_precomputed(different_vec, statute_vec)
         
         # Similarity should be lower for different content
         self.assertLess(diff_similarity, similarity, "Different texts should have lower similarity")
     
+    def test_calculate_similarity_backends(self):
+        """Test that calculate_similarity scores the same with simsimd and the NumPy fallback"""
+        if not statute_lookup.HAS_SIMSIMD:
+            self.skipTest("simsimd is not installed")
+        
+        mock_model = MagicMock()
+        mock_model.encode.return_value = np.array([[0.6, 0.8, 0.0], [0.8, 0.0, 0.6]], dtype=np.float32)
+        
+        scores = {}
+        with patch.object(self.lookup_service, '_get_embedding_model', return_value=mock_model):
+            for has_simsimd in (True, False):
+                with patch.object(statute_lookup, 'HAS_SIMSIMD', has_simsimd):
+                    scores[has_simsimd] = self.lookup_service.calculate_similarity("text one", "text two")
+        
+        mock_model.encode.assert_called_with(["text one", "text two"])
+        self.assertAlmostEqual(scores[True], scores[False], places=5)
+        self.assertAlmostEqual(scores[False], 0.48, places=5)
+    
     def test_batch_process_statutes(self):
         """Test batch processing of statutes"""
-        # Create a mock for compare_transcript_to_statute instead of fetch_statute
-        with patch.object(self.lookup_service, 'compare_transcript_to_statute') as mock_compare:
-            # Set up the mock to return test comparison data
-            mock_compare.return_value = {
-                "statute_id": "mock_id",
-                "similarity_score": 0.8,
-                "is_discrepancy": False
-            }
-            
-            # Create test data for batch processing
-            statutes = [
-                {"statute_id": "123.45", "text": "Section 123.45 says something"},
-                {"statute_id": "456.78", "text": "Chapter 456.78 requires compliance"}
-            ]
-            
+        mock_model = MagicMock()
+        mock_model.encode.side_effect = _encode_unit_vectors
+        
+        with patch.object(self.lookup_service, 'fetch_statutes', return_value=_STATUTE_DATA) as mock_fetch, \
+             patch.object(self.lookup_service, '_get_embedding_model', return_value=mock_model):
             # Process the statutes
+            results = self.lookup_service.batch_process_statutes(list(_STATUTES_FIXTURE))
+        
+        # Verify results
+        self.assertEqual(len(results), 4, "Should process all statute entries")
+        self.assertEqual([r["statute_id"] for r in results], ["123.45", "456.78", "123.45", "999.99"])
+        self.assertAlmostEqual(results[0]["similarity_score"], 1.0, places=5)
+        self.assertFalse(results[1]["is_discrepancy"], "Matching embeddings should not be a discrepancy")
+        self.assertEqual(results[2]["transcript_text"], "Section 123.45 again")
+        self.assertTrue(results[3]["is_discrepancy"], "Missing statutes should be flagged")
+        self.assertEqual(results[3]["similarity_score"], 0.0)
+        
+        # Statutes are fetched together and everything is encoded in one call
+        mock_fetch.assert_called_once_with(["123.45", "456.78", "123.45", "999.99"])
+        self.assertEqual(mock_model.encode.call_count, 1, "Should encode all texts in a single call")
+        encoded_texts = mock_model.encode.call_args[0][0]
+        self.assertEqual(len(encoded_texts), 5, "Should encode three snippets and two statute texts")
+
+    def test_cached_embeddings_are_quantized(self):
+        """Test that statute embeddings are stored as int8 and reused on later comparisons"""
+        statute = _STATUTE_DATA["123.45"]
+        self.lookup_service._update_cache_many([self.lookup_service._cache_row("123.45", statute)])
+        
+        mock_model = MagicMock()
+        mock_model.encode.side_effect = _encode_unit_vectors
+        
+        with patch.object(self.lookup_service, 'fetch_statutes', return_value={"123.45": statute}), \
+             patch.object(self.lookup_service, '_get_embedding_model', return_value=mock_model):
+            statutes = list(_STATUTES_FIXTURE[:1])
+            self.lookup_service.batch_process_statutes(statutes)
+            results = self.lookup_service.batch_process_statutes(statutes)
+        
+        # The second batch only encodes the transcript snippet
+        self.assertEqual(len(mock_model.encode.call_args[0][0]), 1, "Should reuse the cached statute embedding")
+        self.assertAlmostEqual(results[0]["similarity_score"], 1.0, places=3)
+        
+        blob, embedding_format = self.lookup_service._conn.execute(
+            "SELECT embedding, embedding_format FROM statutes WHERE id = ?", ("123.45",)
+        ).fetchone()
+        self.assertEqual(len(blob), 4 + 2, "Should store a float32 scale and one byte per dimension")
+        self.assertEqual(embedding_format, 1)
+
+    def test_cache_backend_stores_embeddings(self):
+        """Test that a cache backend keeps statute embeddings in its entries without opening SQLite"""
+        cache = {}
+        self.lookup_service = StatuteLookupService(cache_backend=cache)
+        self.assertIsNone(self.lookup_service._conn, "Should not open a database")
+        
+        statute = _STATUTE_DATA["123.45"]
+        self.lookup_service._update_cache_many([self.lookup_service._cache_row("123.45", statute)])
+        
+        mock_model = MagicMock()
+        mock_model.encode.side_effect = _encode_unit_vectors
+        
+        with patch.object(self.lookup_service, 'fetch_statutes', return_value={"123.45": statute}), \
+             patch.object(self.lookup_service, '_get_embedding_model', return_value=mock_model):
+            statutes = list(_STATUTES_FIXTURE[:1])
+            self.lookup_service.batch_process_statutes(statutes)
             results = self.lookup_service.batch_process_statutes(statutes)
-            
-            # Verify results
-            self.assertEqual(len(results), 2, "Should process all statute entries")
-            self.assertTrue("similarity_score" in results[0], "Should calculate similarity scores")
-            self.assertTrue("is_discrepancy" in results[0], "Should determine discrepancies")
-            
-            # Verify the mock was called correctly
-            self.assertEqual(mock_compare.call_count, 2, "Should call compare_transcript_to_statute twice")
+        
+        self.assertEqual(len(mock_model.encode.call_args[0][0]), 1, "Should reuse the cached statute embedding")
+        self.assertAlmostEqual(results[0]["similarity_score"], 1.0, places=5)
+        np.testing.assert_allclose(cache["123.45"][2], _UNIT_VECTOR)
+
+    def test_update_cache_embeds_in_background(self):
+        """Test that caching a statute backfills its embedding off the caller's thread"""
+        mock_model = MagicMock()
+        mock_model.encode.return_value = _UNIT_VECTOR
+        
+        with patch.object(StatuteLookupService, '_model', mock_model):
+            self.lookup_service._update_cache("123.45", _STATUTE_DATA["123.45"])
+            self.lookup_service._embed_executor.shutdown(wait=True)
+        
+        mock_model.encode.assert_called_once_with("Statute text 123.45")
+        blob, embedding_format = self.lookup_service._conn.execute(
+            "SELECT embedding, embedding_format FROM statutes WHERE id = ?", ("123.45",)
+        ).fetchone()
+        np.testing.assert_allclose(self.lookup_service._load_embedding(blob, embedding_format),
+                                   [0.6, 0.8], atol=1e-2)
+
+    def test_compare_waits_for_background_embedding(self):
+        """Test that a comparison right after caching reuses the embedding being backfilled"""
+        statute = _STATUTE_DATA["123.45"]
+        release = threading.Event()
+        
+        def held_encode(text, **kwargs):
+            if text == statute["text"]:
+                # Hold the background encode until the comparison waits on it
+                release.wait(5)
+            return _UNIT_VECTOR
+        
+        def release_and_wait(futures):
+            self.assertFalse(any(future.done() for future in futures), "Background encode should still be running")
+            release.set()
+            return wait(futures)
+        
+        mock_model = MagicMock()
+        mock_model.encode.side_effect = held_encode
+        
+        with patch.object(StatuteLookupService, '_model', mock_model), \
+             patch.object(self.lookup_service, 'fetch_statute', return_value=statute), \
+             patch.object(statute_lookup, 'wait', side_effect=release_and_wait) as mock_wait:
+            self.lookup_service._update_cache("123.45", statute)
+            pending = self.lookup_service._pending_embeddings["123.45"]
+            result = self.lookup_service.compare_transcript_to_statute("Section 123.45", "123.45")
+        
+        mock_wait.assert_called_once_with([pending])
+        encoded_texts = [call.args[0] for call in mock_model.encode.call_args_list]
+        self.assertEqual(encoded_texts.count(statute["text"]), 1, "Should encode the statute only once")
+        self.assertAlmostEqual(result["similarity_score"], 1.0, places=3)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,60 @@
+"""
+Tests for the transcription cache
+"""
+import unittest
+from datetime import datetime, timedelta
+
+from app.services.transcription_cache import TranscriptionCache, CACHE_EXPIRY
+
+class TestTranscriptionCache(unittest.TestCase):
+    """Test cases for the TranscriptionCache class"""
+
+    def setUp(self):
+        """Set up an in-memory cache holding at most two transcriptions"""
+        self.cache = TranscriptionCache(db_path=":memory:", max_entries=2)
+
+    def _set_last_updated(self, file_id, last_updated):
+        """Backdate a cached transcription"""
+        self.cache._conn.execute(
+            "UPDATE transcriptions SET last_updated = ? WHERE file_id = ?",
+            (last_updated.isoformat(), file_id)
+        )
+
+    def test_get_and_set(self):
+        """Test that results are cached per file and model settings"""
+        self.cache.set("file1", "small", {"transcription": "Hello"})
+
+        self.assertEqual(self.cache.get("file1", "small"), {"transcription": "Hello"})
+        self.assertIsNone(self.cache.get("file1", "medium"), "Other settings should miss the cache")
+        self.assertIsNone(self.cache.get("file2", "small"))
+
+    def test_least_recently_used_are_evicted(self):
+        """Test that reads keep an entry and the least recently used one is deleted"""
+        now = datetime.now()
+        self.cache.set("file1", "small", {"transcription": "one"})
+        self.cache.set("file2", "small", {"transcription": "two"})
+        self._set_last_updated("file1", now - timedelta(minutes=2))
+        self._set_last_updated("file2", now - timedelta(minutes=1))
+
+        # Reading file1 makes file2 the least recently used
+        self.assertIsNotNone(self.cache.get("file1", "small"))
+        self.cache.set("file3", "small", {"transcription": "three"})
+
+        self.assertIsNotNone(self.cache.get("file1", "small"))
+        self.assertIsNone(self.cache.get("file2", "small"), "Least recently used entry should be evicted")
+        self.assertIsNotNone(self.cache.get("file3", "small"))
+
+    def test_expired_entries(self):
+        """Test that entries expire with the statute cache"""
+        self.cache.set("file1", "small", {"transcription": "old"})
+        self._set_last_updated("file1", datetime.now() - timedelta(days=CACHE_EXPIRY + 1))
+
+        self.assertIsNone(self.cache.get("file1", "small"), "Expired entries should not be returned")
+
+        # The next write deletes it
+        self.cache.set("file2", "small", {"transcription": "new"})
+        count = self.cache._conn.execute("SELECT COUNT(*) FROM transcriptions").fetchone()[0]
+        self.assertEqual(count, 1)
+
+if __name__ == '__main__':
+    unittest.main()